@@ -50,6 +50,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "diary.middleware.UserContextMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -67,6 +68,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "diary.context_processors.user_context",
             ],
         },
     },
@@ -90,6 +92,54 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "calendar-cards"),
+        # A year page alone caches over 400 day tiles, well above the default
+        # of 300 entries of the local-memory backend.
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", 10000)),
+        },
+    }
+}
+
+# Cached calendar months are invalidated through the cache itself, so every
+# process must share it: with the local-memory backend a write only reaches
+# the cache of the process that made it, and other web workers and Celery
+# keep serving the stale months for up to CALENDAR_CACHE_TIMEOUT. Use a
+# shared backend (Redis, Memcached, database) for more than one process.
+CALENDAR_CACHE_TIMEOUT = int(os.environ.get("CALENDAR_CACHE_TIMEOUT", 60 * 60))
+
+# Rendered day tiles are keyed on their content, so they never go stale and
+# the timeout only bounds how long unused fragments stay around. Only applies
+# with CALENDAR_COMPILED_TILES off.
+DAY_TILE_CACHE_TIMEOUT = int(os.environ.get("DAY_TILE_CACHE_TIMEOUT", 60 * 60 * 24))
+
+# Stream multi-month and year pages month by month instead of rendering them
+# into a single response body.
+CALENDAR_STREAMING = os.environ.get("CALENDAR_STREAMING", "True") == "True"
+
+# Render day tiles with the Python renderer in diary/tiles.py instead of
+# including diary/day_tile.html once per day. The template's per-tile
+# {% cache %} fragments (DAY_TILE_CACHE_TIMEOUT) are only used when this is
+# off.
+CALENDAR_COMPILED_TILES = os.environ.get("CALENDAR_COMPILED_TILES", "True") == "True"
+
+# Parse every icon of static/images/icons/ when the app starts instead of on
+# first use.
+PRELOAD_ICONS = os.environ.get("PRELOAD_ICONS", "False") == "True"
+
+# Reference icons from the sprite built by `manage.py build_icon_sprite`
+# instead of inlining their markup. Falls back to inlining without a sprite.
+ICON_SPRITE = os.environ.get("ICON_SPRITE", "False") == "True"
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -143,6 +193,9 @@ EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 MAILER_EMAIL_BACKEND = EMAIL_BACKEND
 SERVER_EMAIL = EMAIL_HOST_USER
 
+# How many emails send_bulk_notifications sends over one SMTP connection.
+EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE", 100))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -196,6 +249,23 @@ CELERY_TIMEZONE = "Europe/Warsaw"
 CELERY_ENABLE_UTC = False
 
 
+# Reminders
+
+# Send reminders from the diary.ReminderSchedule table, filled with
+# `manage.py rebuild_reminder_schedule` and kept in step on every change.
+# Turn off to match the time zones in use against the current minute instead.
+REMINDER_SCHEDULE = os.environ.get("REMINDER_SCHEDULE", "True") == "True"
+
+# How far back a run of the reminder task catches up on reminders that
+# became due while it was late or not running.
+REMINDER_CATCH_UP_MINUTES = int(os.environ.get("REMINDER_CATCH_UP_MINUTES", 60))
+
+# Reminders are sent by a long-running `manage.py dispatch_reminders`
+# process instead of the periodic check_reminders task. Requires
+# REMINDER_SCHEDULE.
+REMINDER_DISPATCHER = os.environ.get("REMINDER_DISPATCHER", "False") == "True"
+
+
 # reCAPTCHA
 
 RECAPTCHA_PUBLIC_KEY = os.environ.get("RECAPTCHA_PUBLIC_KEY")
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:15
+
+import account.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0006_create_section_model"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="settings",
+            name="token",
+            field=models.CharField(
+                db_index=True, default=account.models.get_token, max_length=100
+            ),
+        ),
+    ]
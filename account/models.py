@@ -37,5 +37,5 @@ class Settings(models.Model):
     user = models.ForeignKey(
         Accounts, on_delete=models.CASCADE, related_name="settings"
     )
-    token = models.CharField(max_length=100, default=get_token)
+    token = models.CharField(max_length=100, default=get_token, db_index=True)
     time_zone = models.CharField(max_length=100, default=settings.TIME_ZONE)
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class DiaryConfig(AppConfig):
@@ -6,4 +7,9 @@ class DiaryConfig(AppConfig):
     name = "diary"
 
     def ready(self):
-        pass
+        from . import signals  # noqa: F401
+
+        if settings.PRELOAD_ICONS:
+            from .templatetags.icons import preload_icons
+
+            preload_icons()
@@ -0,0 +1,134 @@
+import datetime
+import functools
+import time
+import typing
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .loaders import CalendarRange, load_calendar_range
+from .models import Section
+
+# Bump whenever the shape of the cached CalendarRange changes, so entries
+# written by an older deploy are never read back.
+CACHE_FORMAT = 3
+
+
+def _version_key(user_id: int) -> str:
+    return f"diary:calendar:version:{user_id}"
+
+
+def _month_key(section: Section, version: int, month: datetime.date) -> str:
+    return (
+        f"diary:calendar:{CACHE_FORMAT}:{section.user_id}:{version}:"
+        f"{section.pk}:{month:%Y-%m}"
+    )
+
+
+def _new_version() -> int:
+    # Never reused, so an evicted version key cannot bring back the entries
+    # of an older version.
+    return time.time_ns()
+
+
+def get_calendar_version(user_id: int) -> int:
+    return cache.get_or_set(_version_key(user_id), _new_version, timeout=None)
+
+
+def invalidate_calendar(user_id: typing.Optional[int]) -> None:
+    """
+    Drop every cached calendar month of the user's sections.
+
+    Entries are keyed by a per-user version, so bumping it is enough; the old
+    entries simply stop being read and expire on their own.
+    """
+    if user_id is None:
+        return
+
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), _new_version(), timeout=None)
+
+
+def schedule_calendar_invalidation(user_id: typing.Optional[int]) -> None:
+    """
+    Invalidate the user's calendar once the current transaction commits, so a
+    request running in between cannot cache the half-written state again.
+    """
+    transaction.on_commit(functools.partial(invalidate_calendar, user_id))
+
+
+def _month_starts(
+    start_date: datetime.date, end_date: datetime.date
+) -> typing.List[datetime.date]:
+    months = []
+    current_month = start_date.replace(day=1)
+
+    while current_month <= end_date:
+        months.append(current_month)
+        current_month += relativedelta(months=1)
+
+    return months
+
+
+def _month_end(month: datetime.date) -> datetime.date:
+    return month + relativedelta(months=1) - datetime.timedelta(days=1)
+
+
+def load_cached_calendar_range(
+    section: typing.Optional[Section],
+    start_date: datetime.date,
+    end_date: datetime.date,
+) -> CalendarRange:
+    """
+    Same as `load_calendar_range`, but served month by month from the cache.
+
+    The returned range is widened to whole months. Months missing from the
+    cache are loaded together in a single pass and stored for next time.
+    """
+    months = _month_starts(start_date, end_date)
+
+    if section is None or not months:
+        return load_calendar_range(section, start_date, end_date)
+
+    calendar_range = CalendarRange(
+        start_date=months[0], end_date=_month_end(months[-1])
+    )
+    version = get_calendar_version(section.user_id)
+    keys = {month: _month_key(section, version, month) for month in months}
+    cached = cache.get_many(keys.values())
+    missing = [month for month in months if keys[month] not in cached]
+
+    if missing:
+        loaded = load_calendar_range(section, missing[0], _month_end(missing[-1]))
+        to_store = {}
+
+        for month in missing:
+            month_range = CalendarRange(
+                start_date=month,
+                end_date=_month_end(month),
+                events={
+                    date: events
+                    for date, events in loaded.events.items()
+                    if date.year == month.year and date.month == month.month
+                },
+                availabilities={
+                    date: availability
+                    for date, availability in loaded.availabilities.items()
+                    if date.year == month.year and date.month == month.month
+                },
+            )
+            cached[keys[month]] = month_range
+            to_store[keys[month]] = month_range
+
+        cache.set_many(to_store, timeout=settings.CALENDAR_CACHE_TIMEOUT)
+
+    for month in months:
+        month_range = cached[keys[month]]
+        calendar_range.events.update(month_range.events)
+        calendar_range.availabilities.update(month_range.availabilities)
+
+    return calendar_range
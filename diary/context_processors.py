@@ -0,0 +1,2 @@
+def user_context(request):
+    return {"user_context": getattr(request, "user_context", None)}
@@ -8,6 +8,12 @@ from account.models import Accounts
 from utilities.forms import StringListField
 from utilities.time import half_hour_intervals, time_slots
 
+from .freebusy import (
+    MAX_FREE_BUSY_DAYS,
+    MAX_FREE_BUSY_SECTIONS,
+    FreeBusy,
+    load_free_busy,
+)
 from .models import (
     Availability,
     Event,
@@ -16,6 +22,7 @@ from .models import (
     AvailabilityEvent,
     EventReminderType,
     AvailabilityTimeSlot,
+    RecurrenceFrequency,
 )
 
 
@@ -56,6 +63,30 @@ class BaseEventForm(RemindersMixin):
     dates = StringListField()
     start_time = forms.TimeField(required=False)
     end_time = forms.TimeField(required=False)
+    recurrence_frequency = forms.ChoiceField(
+        choices=RecurrenceFrequency.choices, required=False
+    )
+    # Bounded by the model's PositiveSmallIntegerField and PositiveIntegerField.
+    recurrence_interval = forms.IntegerField(
+        min_value=1,
+        max_value=32767,
+        required=False,
+        error_messages={
+            "min_value": "Recurrence interval must be at least 1.",
+            "max_value": "Recurrence interval cannot be greater than 32767.",
+        },
+    )
+    recurrence_until = forms.DateField(required=False)
+    recurrence_count = forms.IntegerField(
+        min_value=1,
+        max_value=2147483647,
+        required=False,
+        error_messages={
+            "min_value": "Recurrence count must be at least 1.",
+            "max_value": "Recurrence count cannot be greater than 2147483647.",
+        },
+    )
+    recurrence_exceptions = StringListField()
 
     _require_dates = True
 
@@ -75,6 +106,13 @@ class BaseEventForm(RemindersMixin):
         if start_time and end_time:
             clean_start_and_end_time(start_time, end_time)
 
+        if cleaned_data.get("recurrence_until") and cleaned_data.get(
+            "recurrence_count"
+        ):
+            raise forms.ValidationError(
+                "You cannot provide both a recurrence end date and count."
+            )
+
         return cleaned_data
 
     def clean_dates(self) -> typing.List[str]:
@@ -94,6 +132,42 @@ class BaseEventForm(RemindersMixin):
 
         return dates
 
+    def clean_recurrence_exceptions(self) -> typing.List[str]:
+        cleaned_data = self.cleaned_data
+
+        exceptions = cleaned_data.get("recurrence_exceptions")
+
+        for date in exceptions:
+            try:
+                datetime.datetime.strptime(date, "%Y-%m-%d")
+            except (ValueError, TypeError):
+                raise forms.ValidationError("Dates must be in format YYYY-MM-DD.")
+
+        return exceptions
+
+    def get_recurrence(self) -> typing.Dict[str, typing.Any]:
+        frequency: str = self.cleaned_data.get("recurrence_frequency") or None
+
+        if frequency is None:
+            return {
+                "recurrence_frequency": None,
+                "recurrence_interval": 1,
+                "recurrence_until": None,
+                "recurrence_count": None,
+                "recurrence_exceptions": [],
+            }
+
+        return {
+            "recurrence_frequency": frequency,
+            "recurrence_interval": self.cleaned_data.get("recurrence_interval") or 1,
+            "recurrence_until": self.cleaned_data.get("recurrence_until"),
+            "recurrence_count": self.cleaned_data.get("recurrence_count"),
+            "recurrence_exceptions": [
+                datetime.datetime.strptime(date, "%Y-%m-%d").date()
+                for date in self.cleaned_data.get("recurrence_exceptions")
+            ],
+        }
+
     def clean_guests(self) -> typing.List[str]:
         email_validator = EmailValidator()
 
@@ -161,6 +235,7 @@ class CreateEventForm(BaseEventForm):
             meeting_location=address,
             section=section,
             reminders=reminders,
+            **self.get_recurrence(),
         )
 
         for guest in guests:
@@ -171,7 +246,8 @@ class CreateEventForm(BaseEventForm):
                 event.anonymous_guests.append(guest)
                 event.send_anonymous_invitation_email(guest)
 
-            event.save()
+        if event.anonymous_guests:
+            event.save(update_fields=["anonymous_guests"])
 
         return event
 
@@ -222,7 +298,11 @@ class EditEventForm(CreateEventForm):
         event.reminders = self.cleaned_data.get("reminders")
         event.section = section
 
-        event.save()
+        # Recurrence is only touched when the client sends it, so older clients
+        # editing other fields do not turn a series back into single dates.
+        if "recurrence_frequency" in self.data:
+            for field, value in self.get_recurrence().items():
+                setattr(event, field, value)
 
         dates = [
             datetime.datetime.strptime(date, "%Y-%m-%d").date()
@@ -233,21 +313,18 @@ class EditEventForm(CreateEventForm):
             for date in self.cleaned_data.get("deleted_dates")
         ]
 
-        for date in dates:
-            if date not in event.dates:
-                event.dates.append(date)
-
-            event.save()
-
-        for date in deleted_dates:
-            if date in event.dates:
-                event.dates.remove(date)
-
-            event.save()
+        event.dates = [
+            date
+            for date in event.dates
+            + [date for date in dates if date not in event.dates]
+            if date not in deleted_dates
+        ]
+        event.save()
 
         event.send_update_email()
 
         guests = self.cleaned_data.get("guests")
+        anonymous_guests_changed = False
 
         for guest in guests:
             if (account := Accounts.objects.filter(email=guest).first()) is not None:
@@ -261,8 +338,10 @@ class EditEventForm(CreateEventForm):
                 if guest not in event.anonymous_guests:
                     event.anonymous_guests.append(guest)
                     event.send_anonymous_invitation_email(guest)
+                    anonymous_guests_changed = True
 
-            event.save()
+        if anonymous_guests_changed:
+            event.save(update_fields=["anonymous_guests"])
 
         return event
 
@@ -507,3 +586,63 @@ class EditAvailabilityEventForm(RemindersMixin):
         self.event.save()
 
         return self.event
+
+
+class FreeBusyForm(forms.Form):
+    sections = StringListField()
+    start_date = forms.DateField(error_messages={"required": "Start date is required."})
+    end_date = forms.DateField(error_messages={"required": "End date is required."})
+
+    def clean(self):
+        cleaned_data = super().clean()
+
+        start_date: datetime.date = cleaned_data.get("start_date")
+        end_date: datetime.date = cleaned_data.get("end_date")
+
+        if start_date is not None and end_date is not None:
+            if start_date > end_date:
+                raise forms.ValidationError("End date must not be before start date.")
+
+            if (end_date - start_date).days >= MAX_FREE_BUSY_DAYS:
+                raise forms.ValidationError(
+                    f"Date range cannot exceed {MAX_FREE_BUSY_DAYS} days."
+                )
+
+        return cleaned_data
+
+    def clean_sections(self) -> typing.List[str]:
+        tokens = set(token for token in self.cleaned_data.get("sections") if token)
+
+        if not tokens:
+            raise forms.ValidationError("Sections are required.")
+
+        if len(tokens) > MAX_FREE_BUSY_SECTIONS:
+            raise forms.ValidationError(
+                f"Cannot compare more than {MAX_FREE_BUSY_SECTIONS} sections."
+            )
+
+        self.sections = list(
+            Section.objects.filter(token__in=tokens).select_related("user")
+        )
+
+        if len(self.sections) != len(tokens):
+            raise forms.ValidationError("Section does not exist.")
+
+        return list(tokens)
+
+    def load(self, user: Accounts, time_zone: str) -> FreeBusy:
+        """
+        Sections of other users are shared by token, so their owners are only
+        busy with the bookings of those sections. The requesting user's whole
+        calendar counts.
+        """
+        users = {section.user_id: section.user for section in self.sections}
+
+        return load_free_busy(
+            list(users.values()),
+            self.cleaned_data.get("start_date"),
+            self.cleaned_data.get("end_date"),
+            time_zone,
+            sections=self.sections,
+            private_user_ids={user.pk},
+        )
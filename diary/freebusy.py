@@ -0,0 +1,306 @@
+import dataclasses
+import datetime
+import typing
+
+import numpy as np
+from django.db.models import F, Q
+
+from account.models import Accounts, Settings
+from utilities.time import TIME_SLOT_MINUTES, get_timezone, time_slots
+
+from .intervals import to_minutes
+from .models import Availability, AvailabilityEvent, EventOccurrence, Section
+from .recurrence import RECURRENCE_FIELDS, expand_recurring_events, recurring_events
+
+SLOT_COUNT = len(time_slots)
+MAX_FREE_BUSY_DAYS = 366
+MAX_FREE_BUSY_SECTIONS = 50
+
+
+@dataclasses.dataclass
+class FreeBusy:
+    """
+    Free time of several users as a users × days × `time_slots` boolean array,
+    aligned on the time zone it was loaded for.
+    """
+
+    start_date: datetime.date
+    users: typing.List[Accounts]
+    free: np.ndarray
+
+    @property
+    def common(self) -> np.ndarray:
+        """
+        Days × slots array of the slots every user is free in.
+        """
+        if not self.users:
+            return np.zeros(self.free.shape[1:], dtype=bool)
+
+        return self.free.all(axis=0)
+
+    def common_ranges(
+        self,
+    ) -> typing.Dict[datetime.date, typing.List[typing.Tuple[int, int]]]:
+        """
+        The common free slots of each day, merged into [start, end) ranges of
+        slot indices.
+        """
+        common = self.common.astype(np.int8)
+        edges = np.diff(np.pad(common, ((0, 0), (1, 1))), axis=1)
+        starts = np.argwhere(edges == 1)
+        ends = np.argwhere(edges == -1)
+        ranges = {}
+
+        # Both are sorted by day then slot, so the n-th start pairs with the
+        # n-th end.
+        for (day, start), (_, end) in zip(starts, ends):
+            date = self.start_date + datetime.timedelta(days=int(day))
+            ranges.setdefault(date, []).append((int(start), int(end)))
+
+        return ranges
+
+
+def _slot_bounds(
+    start_times: typing.Sequence[datetime.time],
+    end_times: typing.Sequence[datetime.time],
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    starts = np.array([to_minutes(value) for value in start_times], dtype=np.int32)
+    ends = np.array([to_minutes(value, True) for value in end_times], dtype=np.int32)
+
+    return starts // TIME_SLOT_MINUTES, -(-ends // TIME_SLOT_MINUTES)
+
+
+def _load_offered(
+    free: np.ndarray,
+    user_indexes: typing.Dict[int, int],
+    start_date: datetime.date,
+    end_date: datetime.date,
+    sections: typing.Optional[typing.Sequence[Section]],
+):
+    availabilities = Availability.objects.filter(
+        user_id__in=user_indexes, date__range=(start_date, end_date)
+    )
+
+    if sections is not None:
+        availabilities = availabilities.filter(section__in=sections)
+
+    rows = list(availabilities.values_list("user_id", "date", "slot_mask"))
+
+    if not rows:
+        return
+
+    user_ids, dates, masks = zip(*rows)
+    bits = (np.array(masks, dtype=np.int64)[:, None] >> np.arange(SLOT_COUNT)) & 1 == 1
+
+    np.logical_or.at(
+        free,
+        (
+            np.array([user_indexes[user_id] for user_id in user_ids]),
+            np.array([(date - start_date).days for date in dates]),
+        ),
+        bits,
+    )
+
+
+def _busy_rows(
+    user_ids: typing.Sequence[int],
+    start_date: datetime.date,
+    end_date: datetime.date,
+    sections: typing.Optional[typing.Sequence[Section]],
+    private_user_ids: typing.Collection[int],
+) -> typing.Iterator[typing.Tuple[int, datetime.date, datetime.time, datetime.time]]:
+    """
+    (user id, date, start, end) of everything the users are booked for.
+
+    Only the users of `private_user_ids` have their events, accepted
+    invitations and availability events outside `sections` counted, as the
+    others' would reveal private plans to whoever holds a section token.
+    All-day events do not take up any slot, like birthdays or holidays on a
+    shared calendar would not.
+    """
+    availability_events = AvailabilityEvent.objects.filter(
+        availability__user_id__in=user_ids,
+        availability__date__range=(start_date, end_date),
+    )
+
+    if sections is not None:
+        availability_events = availability_events.filter(
+            Q(availability__section__in=sections)
+            | Q(availability__user_id__in=private_user_ids)
+        )
+
+    yield from availability_events.values_list(
+        "availability__user_id", "availability__date", "start_time", "end_time"
+    )
+
+    user_ids = [user_id for user_id in user_ids if user_id in private_user_ids]
+
+    if not user_ids:
+        return
+
+    occurrences = EventOccurrence.objects.filter(
+        date__range=(start_date, end_date),
+        event__starting_time__isnull=False,
+        event__ending_time__isnull=False,
+    )
+    occurrence_fields = ("date", "event__starting_time", "event__ending_time")
+
+    for user_id, *row in occurrences.filter(event__owner_id__in=user_ids).values_list(
+        "event__owner_id", *occurrence_fields
+    ):
+        yield user_id, *row
+
+    for user_id, *row in occurrences.filter(
+        event__invitations__user_id__in=user_ids,
+        event__invitations__accepted=True,
+    ).values_list("event__invitations__user_id", *occurrence_fields):
+        yield user_id, *row
+
+    owned = (
+        recurring_events(start_date)
+        .filter(
+            owner_id__in=user_ids,
+            starting_time__isnull=False,
+            ending_time__isnull=False,
+        )
+        .only(*RECURRENCE_FIELDS, "owner")
+    )
+    invited = (
+        recurring_events(start_date)
+        .filter(
+            invitations__user_id__in=user_ids,
+            invitations__accepted=True,
+            starting_time__isnull=False,
+            ending_time__isnull=False,
+        )
+        .annotate(invitation_user_id=F("invitations__user_id"))
+        .only(*RECURRENCE_FIELDS)
+    )
+
+    for event, date in expand_recurring_events(owned, start_date, end_date):
+        yield event.owner_id, date, event.starting_time, event.ending_time
+
+    for event, date in expand_recurring_events(invited, start_date, end_date):
+        yield event.invitation_user_id, date, event.starting_time, event.ending_time
+
+
+def _load_busy(
+    busy: np.ndarray,
+    user_indexes: typing.Dict[int, int],
+    start_date: datetime.date,
+    end_date: datetime.date,
+    sections: typing.Optional[typing.Sequence[Section]],
+    private_user_ids: typing.Collection[int],
+):
+    rows = list(
+        _busy_rows(list(user_indexes), start_date, end_date, sections, private_user_ids)
+    )
+
+    if not rows:
+        return
+
+    user_ids, dates, start_times, end_times = zip(*rows)
+    first, last = _slot_bounds(start_times, end_times)
+    users = np.array([user_indexes[user_id] for user_id in user_ids])
+    days = np.array([(date - start_date).days for date in dates])
+
+    # Mark where each booking starts and stops; a running sum over the slots
+    # is then positive wherever any booking is under way.
+    changes = np.zeros(busy.shape[:2] + (SLOT_COUNT + 1,), dtype=np.int32)
+    np.add.at(changes, (users, days, first), 1)
+    np.add.at(changes, (users, days, last), -1)
+    busy |= np.cumsum(changes, axis=2)[..., :SLOT_COUNT] > 0
+
+
+def _utc_offsets(time_zone: str, dates: typing.Sequence[datetime.date]) -> np.ndarray:
+    timezone = get_timezone(time_zone)
+
+    return np.array(
+        [
+            timezone.utcoffset(datetime.datetime.combine(date, datetime.time(12)))
+            // datetime.timedelta(minutes=1)
+            for date in dates
+        ],
+        dtype=np.int32,
+    )
+
+
+def _align(grid: np.ndarray, shift: np.ndarray) -> np.ndarray:
+    """
+    Move a days × slots grid kept in another time zone onto the target one,
+    `shift` being the other zone's lead in minutes for each day.
+
+    A target slot straddling two of the other zone's slots (offsets that are
+    not whole half hours) is only free when both of them are.
+    """
+    days = grid.shape[0]
+    flat = np.append(grid.reshape(-1), False)
+    minutes = (
+        np.arange(days * SLOT_COUNT).reshape(days, SLOT_COUNT) * TIME_SLOT_MINUTES
+        + shift[:, None]
+    )
+    first = minutes // TIME_SLOT_MINUTES
+    second = first + (minutes % TIME_SLOT_MINUTES != 0)
+    outside = len(flat) - 1
+
+    def take(indexes: np.ndarray) -> np.ndarray:
+        return flat[np.where((indexes >= 0) & (indexes < outside), indexes, outside)]
+
+    return take(first) & take(second)
+
+
+def load_free_busy(
+    users: typing.Sequence[Accounts],
+    start_date: datetime.date,
+    end_date: datetime.date,
+    time_zone: str,
+    sections: typing.Optional[typing.Sequence[Section]] = None,
+    private_user_ids: typing.Optional[typing.Collection[int]] = None,
+) -> FreeBusy:
+    """
+    Load when each user is free between two dates.
+
+    A user is free in the slots offered by their availabilities (only those of
+    `sections`, when given) that none of their availability events, events or
+    accepted invitations take up. Only the users of `private_user_ids`
+    (everyone, when not given) have their events, invitations and the
+    availability events outside `sections` counted. Every user's grid is
+    moved onto `time_zone`, so calendars kept in different zones line up.
+    Takes a fixed number of queries whatever the number of users.
+    """
+    users = list(users)
+    user_indexes = {user.pk: index for index, user in enumerate(users)}
+    days = max((end_date - start_date).days + 1, 0)
+    free = np.zeros((len(users), days, SLOT_COUNT), dtype=bool)
+
+    if not users or not days:
+        return FreeBusy(start_date, users, free)
+
+    busy = np.zeros_like(free)
+
+    if private_user_ids is None:
+        private_user_ids = set(user_indexes)
+
+    _load_offered(free, user_indexes, start_date, end_date, sections)
+    _load_busy(
+        busy, user_indexes, start_date, end_date, sections, set(private_user_ids)
+    )
+    free &= ~busy
+
+    dates = [start_date + datetime.timedelta(days=day) for day in range(days)]
+    target_offsets = _utc_offsets(time_zone, dates)
+    time_zones = dict(
+        Settings.objects.filter(user_id__in=user_indexes).values_list(
+            "user_id", "time_zone"
+        )
+    )
+
+    for user in users:
+        user_time_zone = time_zones.get(user.pk, time_zone)
+
+        if user_time_zone != time_zone:
+            index = user_indexes[user.pk]
+            shift = _utc_offsets(user_time_zone, dates) - target_offsets
+            free[index] = _align(free[index], shift)
+
+    return FreeBusy(start_date, users, free)
@@ -0,0 +1,115 @@
+import bisect
+import datetime
+import typing
+
+from utilities.time import TIME_SLOT_MINUTES, time_slots
+
+Interval = typing.Tuple[int, int]
+
+DAY_MINUTES = 24 * 60
+
+
+def to_minutes(value: datetime.time, is_end: bool = False) -> int:
+    """
+    Minutes since midnight, an end time of midnight being the end of the day.
+    """
+    if is_end and value == datetime.time(0, 0):
+        return DAY_MINUTES
+
+    return value.hour * 60 + value.minute
+
+
+def merge_intervals(intervals: typing.Iterable[Interval]) -> typing.List[Interval]:
+    merged = []
+
+    for start, end in sorted(intervals):
+        if start >= end:
+            continue
+
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def mask_intervals(mask: int) -> typing.List[Interval]:
+    """
+    The runs of set bits of a `time_slots` bitmask, as intervals.
+    """
+    return merge_intervals(
+        (
+            index * TIME_SLOT_MINUTES,
+            (index + 1) * TIME_SLOT_MINUTES,
+        )
+        for index in range(len(time_slots))
+        if mask >> index & 1
+    )
+
+
+class AvailabilityIntervals:
+    """
+    The offered and booked time of an availability as sorted, merged
+    intervals of minutes since midnight.
+
+    Built once from the slot mask and the availability's events, then every
+    range check is a pair of bisections instead of a scan over the events.
+    """
+
+    def __init__(
+        self, free: typing.Iterable[Interval], booked: typing.Iterable[Interval]
+    ):
+        self.free = merge_intervals(free)
+        self.booked = merge_intervals(booked)
+        self._free_starts = [start for start, _ in self.free]
+        self._booked_starts = [start for start, _ in self.booked]
+
+    @classmethod
+    def from_availability(cls, availability) -> "AvailabilityIntervals":
+        return cls(
+            mask_intervals(availability.slot_mask),
+            (
+                (to_minutes(event.start_time), to_minutes(event.end_time, True))
+                for event in availability.events.all()
+            ),
+        )
+
+    def is_offered(self, start: int, end: int) -> bool:
+        index = bisect.bisect_right(self._free_starts, start) - 1
+
+        return index >= 0 and self.free[index][1] >= end
+
+    def is_booked(self, start: int, end: int) -> bool:
+        # The last booking starting before the range ends is the only one
+        # that can reach into it, as the bookings are merged.
+        index = bisect.bisect_left(self._booked_starts, end) - 1
+
+        return index >= 0 and self.booked[index][1] > start
+
+    def is_available(self, start: int, end: int) -> bool:
+        return (
+            start < end
+            and self.is_offered(start, end)
+            and not self.is_booked(start, end)
+        )
+
+    def time_range_is_available(
+        self, start_time: datetime.time, end_time: datetime.time
+    ) -> bool:
+        return self.is_available(to_minutes(start_time), to_minutes(end_time, True))
+
+    @property
+    def available_slot_mask(self) -> int:
+        """
+        Bitmask of the `time_slots` that can still be booked.
+        """
+        mask = 0
+
+        for index in range(len(time_slots)):
+            start = index * TIME_SLOT_MINUTES
+
+            if self.is_available(start, start + TIME_SLOT_MINUTES):
+                mask |= 1 << index
+
+        return mask
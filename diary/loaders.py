@@ -0,0 +1,528 @@
+import collections
+import dataclasses
+import datetime
+import json
+import typing
+
+from django.db import connection
+from django.db.models import F, Q
+
+from account.models import Accounts
+
+from .models import (
+    Availability,
+    AvailabilityEvent,
+    AvailabilityTimeSlot,
+    DaySummary,
+    Event,
+    EventInvitation,
+    EventOccurrence,
+    Section,
+)
+from .recurrence import RECURRENCE_FIELDS, expand_recurring_events, recurring_events
+
+
+class EventTile:
+    """
+    Read-only projection of an event as shown on a day tile.
+
+    Built straight from `values_list()` rows, so rendering a grid does not
+    instantiate full Event or AvailabilityEvent models (and their text fields).
+    """
+
+    __slots__ = (
+        "token",
+        "title",
+        "starting_time",
+        "ending_time",
+        "is_availability_event",
+        "section_token",
+    )
+
+    def __init__(
+        self,
+        token: str,
+        title: str,
+        starting_time: typing.Optional[datetime.time],
+        ending_time: typing.Optional[datetime.time],
+        is_availability_event: bool = False,
+        section_token: typing.Optional[str] = None,
+    ):
+        self.token = token
+        self.title = title
+        self.starting_time = starting_time
+        self.ending_time = ending_time
+        self.is_availability_event = is_availability_event
+        self.section_token = section_token
+
+    def sort_key(self) -> datetime.time:
+        return self.starting_time or datetime.datetime.min.time()
+
+
+class AvailabilityTile:
+    __slots__ = ("token", "time_slots", "section_token")
+
+    def __init__(
+        self,
+        token: str,
+        time_slots: typing.List[typing.Dict[str, str]],
+        section_token: typing.Optional[str] = None,
+    ):
+        self.token = token
+        self.time_slots = time_slots
+        self.section_token = section_token
+
+    @property
+    def jsonified_time_slots(self) -> str:
+        return json.dumps(self.time_slots)
+
+
+@dataclasses.dataclass
+class CalendarRange:
+    start_date: datetime.date
+    end_date: datetime.date
+    events: typing.Dict[datetime.date, typing.List[EventTile]] = dataclasses.field(
+        default_factory=dict
+    )
+    availabilities: typing.Dict[datetime.date, AvailabilityTile] = dataclasses.field(
+        default_factory=dict
+    )
+    summaries: typing.Optional[typing.Dict[datetime.date, DaySummary]] = None
+
+    def covers(self, start_date: datetime.date, end_date: datetime.date) -> bool:
+        return self.start_date <= start_date and end_date <= self.end_date
+
+    def events_for(self, date: datetime.date) -> typing.List[EventTile]:
+        return self.events.get(date, [])
+
+    def availability_for(
+        self, date: datetime.date
+    ) -> typing.Optional[AvailabilityTile]:
+        return self.availabilities.get(date)
+
+    def has_events_on(self, date: datetime.date) -> bool:
+        if self.summaries is None:
+            return len(self.events_for(date)) > 0
+
+        summary = self.summaries.get(date)
+
+        return summary is not None and summary.event_count > 0
+
+
+def load_availability_tiles(
+    sections: typing.Sequence[Section],
+    start_date: datetime.date,
+    end_date: datetime.date,
+) -> typing.Dict[datetime.date, AvailabilityTile]:
+    section_tokens = {section.pk: section.token for section in sections}
+    time_slots = collections.defaultdict(list)
+
+    for availability_id, token, start_time, end_time in (
+        AvailabilityTimeSlot.objects.filter(
+            availability__section__in=sections,
+            availability__date__range=(start_date, end_date),
+        )
+        .order_by("pk")
+        .values_list("availability_id", "token", "start_time", "end_time")
+    ):
+        time_slots[availability_id].append(
+            {
+                "token": token,
+                "start": start_time.strftime("%H:%M"),
+                "end": end_time.strftime("%H:%M"),
+            }
+        )
+
+    availabilities = {}
+
+    # With several sections a day can have more than one availability; the
+    # overlay grid shows the first one.
+    for availability_id, date, token, section_id in (
+        Availability.objects.filter(
+            section__in=sections, date__range=(start_date, end_date)
+        )
+        .order_by("pk")
+        .values_list("id", "date", "token", "section_id")
+    ):
+        availabilities.setdefault(
+            date,
+            AvailabilityTile(
+                token, time_slots[availability_id], section_tokens[section_id]
+            ),
+        )
+
+    return availabilities
+
+
+def load_recurring_dates(
+    sections: typing.Sequence[Section],
+    start_date: datetime.date,
+    end_date: datetime.date,
+) -> typing.List[typing.Tuple[Event, datetime.date, int]]:
+    """
+    Expand the recurring events shown in sections over the given window.
+
+    Only the dates generated by the rules are returned, each with the id of
+    the section showing it; explicit dates are already covered by the
+    occurrence table.
+    """
+    owned = (
+        recurring_events(start_date)
+        .filter(section__in=sections)
+        .only(*RECURRENCE_FIELDS, "section")
+    )
+    invited = (
+        recurring_events(start_date)
+        .filter(invitations__section__in=sections, invitations__accepted=True)
+        .annotate(invitation_section_id=F("invitations__section_id"))
+        .only(*RECURRENCE_FIELDS)
+    )
+
+    return [
+        (event, date, event.section_id)
+        for event, date in expand_recurring_events(owned, start_date, end_date)
+    ] + [
+        (event, date, event.invitation_section_id)
+        for event, date in expand_recurring_events(invited, start_date, end_date)
+    ]
+
+
+def load_calendar_range(
+    section: typing.Optional[Section],
+    start_date: datetime.date,
+    end_date: datetime.date,
+    include_events: bool = True,
+) -> CalendarRange:
+    """
+    Load everything the calendar grid shows for a section between two dates.
+
+    Events, accepted invitations, availability events and availabilities are
+    fetched with a fixed number of queries and bucketed by date, so building
+    a year of day tiles no longer costs a handful of queries per day. Event
+    dates are read from the occurrence table as a range scan on its index.
+
+    Grids that only mark busy days can pass `include_events=False`, in which
+    case the day summaries are read instead of the events themselves.
+    """
+    return load_sections_calendar_range(
+        [section] if section is not None else [],
+        start_date,
+        end_date,
+        include_events,
+    )
+
+
+def load_sections_calendar_range(
+    sections: typing.Sequence[Section],
+    start_date: datetime.date,
+    end_date: datetime.date,
+    include_events: bool = True,
+) -> CalendarRange:
+    """
+    Same as `load_calendar_range`, for any number of sections at once.
+
+    Every query covers all the sections, so the overlay grid costs the same
+    number of queries as a single section. Tiles carry their section token.
+    """
+    calendar_range = CalendarRange(start_date=start_date, end_date=end_date)
+
+    if not sections or start_date > end_date:
+        return calendar_range
+
+    section_tokens = {section.pk: section.token for section in sections}
+
+    calendar_range.availabilities = load_availability_tiles(
+        sections, start_date, end_date
+    )
+
+    recurring = load_recurring_dates(sections, start_date, end_date)
+
+    if not include_events:
+        calendar_range.summaries = {}
+
+        for date, event_count in DaySummary.objects.filter(
+            section__in=sections, date__range=(start_date, end_date)
+        ).values_list("date", "event_count"):
+            summary = calendar_range.summaries.setdefault(date, DaySummary(date=date))
+            summary.event_count += event_count
+
+        for event, date, section_id in recurring:
+            summary = calendar_range.summaries.setdefault(date, DaySummary(date=date))
+            summary.event_count += 1
+
+        return calendar_range
+
+    events = collections.defaultdict(list)
+    occurrence_fields = (
+        "date",
+        "event__token",
+        "event__title",
+        "event__starting_time",
+        "event__ending_time",
+    )
+    occurrences = EventOccurrence.objects.filter(date__range=(start_date, end_date))
+
+    for date, *row, section_id in occurrences.filter(section__in=sections).values_list(
+        *occurrence_fields, "section_id"
+    ):
+        events[date].append(EventTile(*row, section_token=section_tokens[section_id]))
+
+    for date, *row, section_id in occurrences.filter(
+        event__invitations__section__in=sections,
+        event__invitations__accepted=True,
+    ).values_list(*occurrence_fields, "event__invitations__section_id"):
+        events[date].append(EventTile(*row, section_token=section_tokens[section_id]))
+
+    for event, date, section_id in recurring:
+        events[date].append(
+            EventTile(
+                event.token,
+                event.title,
+                event.starting_time,
+                event.ending_time,
+                section_token=section_tokens[section_id],
+            )
+        )
+
+    for (
+        token,
+        title,
+        date,
+        start_time,
+        end_time,
+        section_id,
+    ) in AvailabilityEvent.objects.filter(
+        availability__section__in=sections,
+        availability__date__range=(start_date, end_date),
+    ).values_list(
+        "token",
+        "title",
+        "availability__date",
+        "start_time",
+        "end_time",
+        "availability__section_id",
+    ):
+        events[date].append(
+            EventTile(
+                token,
+                title,
+                start_time,
+                end_time,
+                is_availability_event=True,
+                section_token=section_tokens[section_id],
+            )
+        )
+
+    calendar_range.events = {
+        date: sorted(day_events, key=EventTile.sort_key)
+        for date, day_events in events.items()
+    }
+
+    return calendar_range
+
+
+@dataclasses.dataclass
+class DayBundle:
+    """
+    Everything the day details page shows for one section and date.
+    """
+
+    date: datetime.date
+    events: typing.List[Event]
+    invitations: typing.List[EventInvitation]
+    availability: typing.Optional[Availability]
+    availability_events: typing.List[AvailabilityEvent]
+
+    @property
+    def tiles(self) -> typing.List[EventTile]:
+        """
+        The day's tile events, built from the bundle without another query.
+        """
+        events = [
+            EventTile(event.token, event.title, event.starting_time, event.ending_time)
+            for event in [
+                *self.events,
+                *(invitation.event for invitation in self.invitations),
+            ]
+        ] + [
+            EventTile(
+                event.token,
+                event.title,
+                event.start_time,
+                event.end_time,
+                is_availability_event=True,
+            )
+            for event in self.availability_events
+        ]
+
+        return sorted(events, key=EventTile.sort_key)
+
+
+def load_day_bundle(section: Section, user: Accounts, date: datetime.date) -> DayBundle:
+    """
+    Load a user's events, accepted invitations, availability and availability
+    events of a section on one date.
+
+    Takes at most five queries whatever the day holds: one each for events,
+    invitations and the availability, plus the availability's time slots and
+    events, which are prefetched so the page can walk them without querying.
+    """
+    occurring = EventOccurrence.objects.filter(date=date).values("event_id")
+    recurring = recurring_events(date).values("pk")
+
+    events = [
+        event
+        for event in Event.objects.filter(
+            Q(pk__in=occurring) | Q(pk__in=recurring), owner=user, section=section
+        )
+        if event.occurs_on(date)
+    ]
+    invitations = [
+        invitation
+        for invitation in EventInvitation.objects.filter(
+            Q(event_id__in=occurring) | Q(event_id__in=recurring),
+            user=user,
+            accepted=True,
+            section=section,
+        ).select_related("event")
+        if invitation.event.occurs_on(date)
+    ]
+    availability = (
+        Availability.objects.filter(date=date, user=user, section=section)
+        .prefetch_related("time_slots", "events")
+        .first()
+    )
+
+    return DayBundle(
+        date=date,
+        events=events,
+        invitations=invitations,
+        availability=availability,
+        availability_events=(
+            list(availability.events.all()) if availability is not None else []
+        ),
+    )
+
+
+class DayDensity(typing.NamedTuple):
+    date: datetime.date
+    event_count: int
+    has_past_event: bool
+    has_ongoing_event: bool
+    has_future_event: bool
+
+
+_DAY_DENSITY_SQL = """
+    WITH items AS (
+        SELECT occurrence.date AS day, event.starting_time, event.ending_time
+        FROM {occurrence} AS occurrence
+        JOIN {event} AS event ON event.id = occurrence.event_id
+        WHERE occurrence.section_id = ANY(%(sections)s)
+            AND occurrence.date BETWEEN %(start)s AND %(end)s
+        UNION ALL
+        SELECT occurrence.date, event.starting_time, event.ending_time
+        FROM {invitation} AS invitation
+        JOIN {occurrence} AS occurrence
+            ON occurrence.event_id = invitation.event_id
+        JOIN {event} AS event ON event.id = invitation.event_id
+        WHERE invitation.section_id = ANY(%(sections)s)
+            AND invitation.accepted
+            AND occurrence.date BETWEEN %(start)s AND %(end)s
+        UNION ALL
+        SELECT availability.date, availability_event.start_time,
+            availability_event.end_time
+        FROM {availability_event} AS availability_event
+        JOIN {availability} AS availability
+            ON availability.id = availability_event.availability_id
+        WHERE availability.section_id = ANY(%(sections)s)
+            AND availability.date BETWEEN %(start)s AND %(end)s
+    )
+    SELECT
+        day,
+        COUNT(*),
+        day < %(today)s
+            OR day = %(today)s
+            AND COALESCE(BOOL_OR(ending_time < %(now)s), FALSE),
+        day = %(today)s AND COALESCE(BOOL_OR(
+            starting_time IS NULL
+            OR starting_time <= %(now)s AND ending_time >= %(now)s
+        ), FALSE),
+        day > %(today)s
+            OR day = %(today)s
+            AND COALESCE(BOOL_OR(starting_time > %(now)s), FALSE)
+    FROM items
+    GROUP BY day
+"""
+
+
+def _add_to_density(
+    density: DayDensity, event: Event, now: datetime.datetime
+) -> DayDensity:
+    today = now.date()
+    now_time = now.time().replace(tzinfo=None)
+    is_today = density.date == today
+
+    return density._replace(
+        event_count=density.event_count + 1,
+        has_past_event=density.has_past_event
+        or density.date < today
+        or is_today
+        and event.ending_time is not None
+        and event.ending_time < now_time,
+        has_ongoing_event=density.has_ongoing_event
+        or is_today
+        and (
+            event.starting_time is None
+            or event.starting_time <= now_time <= event.ending_time
+        ),
+        has_future_event=density.has_future_event
+        or density.date > today
+        or is_today
+        and event.starting_time is not None
+        and event.starting_time > now_time,
+    )
+
+
+def load_day_densities(
+    sections: typing.Sequence[Section],
+    start_date: datetime.date,
+    end_date: datetime.date,
+    now: datetime.datetime,
+) -> typing.Tuple[
+    typing.Dict[datetime.date, DayDensity],
+    typing.Dict[datetime.date, AvailabilityTile],
+]:
+    """
+    Aggregate per-day event counts and past/ongoing/future flags in SQL.
+
+    Used by the year density mode, which only needs a marker per day: instead
+    of materialising every event it returns one compact row per busy day,
+    plus the token and time slots of each day's availability.
+    """
+    if not sections or start_date > end_date:
+        return {}, {}
+
+    sql = _DAY_DENSITY_SQL.format(
+        occurrence=EventOccurrence._meta.db_table,
+        event=Event._meta.db_table,
+        invitation=EventInvitation._meta.db_table,
+        availability_event=AvailabilityEvent._meta.db_table,
+        availability=Availability._meta.db_table,
+    )
+    params = {
+        "sections": [section.pk for section in sections],
+        "start": start_date,
+        "end": end_date,
+        "today": now.date(),
+        "now": now.time().replace(tzinfo=None),
+    }
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        densities = {row[0]: DayDensity(*row) for row in cursor.fetchall()}
+
+    for event, date, section_id in load_recurring_dates(sections, start_date, end_date):
+        density = densities.get(date, DayDensity(date, 0, False, False, False))
+        densities[date] = _add_to_density(density, event, now)
+
+    return densities, load_availability_tiles(sections, start_date, end_date)
@@ -0,0 +1,167 @@
+import datetime
+import random
+import re
+import timeit
+
+from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template
+from django.test.utils import override_settings
+
+from diary.loaders import AvailabilityTile, EventTile
+from diary.models import get_token
+
+
+def normalize_html(html: str) -> str:
+    """
+    Drop the whitespace the template's indentation leaves in the markup.
+    """
+    html = re.sub(r"\s+", " ", html)
+    html = re.sub(r"\s*>\s*", ">", html)
+    html = re.sub(r"\s*<\s*", "<", html)
+    html = re.sub(r'="\s*', '="', html)
+    html = re.sub(r'\s*"(\s|>)', r'"\1', html)
+
+    return html.strip()
+
+
+class Command(BaseCommand):
+    help = (
+        "Render a dense 12-month page with the Python day tile renderer and "
+        "with one day_tile.html include per day, check that both produce the "
+        "same markup and print their timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--events-per-day",
+            type=int,
+            default=8,
+            help="Number of events on every day.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of renders to time for each approach.",
+        )
+
+    def handle(self, *args, **options):
+        now = datetime.datetime.now()
+        start_date = now.date().replace(day=1)
+        months = [
+            self.generate_month(
+                start_date + relativedelta(months=offset),
+                now,
+                options["events_per_day"],
+            )
+            for offset in range(12)
+        ]
+        context = {
+            "now": now,
+            "today": now.date(),
+            "display_mode": "year",
+            "start_date": start_date,
+            "expanded": True,
+        }
+
+        def render() -> str:
+            template = get_template("diary/month.html")
+
+            return "".join(
+                template.render({**context, "month": month}) for month in months
+            )
+
+        results = {}
+
+        with override_settings(CALENDAR_COMPILED_TILES=True):
+            results["Python renderer"] = self.measure(render, options["repeat"])
+
+        with override_settings(CALENDAR_COMPILED_TILES=False, DAY_TILE_CACHE_TIMEOUT=0):
+            results["Include per day"] = self.measure(render, options["repeat"])
+
+        cache.clear()
+
+        with override_settings(CALENDAR_COMPILED_TILES=False):
+            render()
+            results["Include per day, cached tiles"] = self.measure(
+                render, options["repeat"]
+            )
+
+        outputs = {normalize_html(html) for html, _ in results.values()}
+
+        if len(outputs) != 1:
+            raise CommandError("The renderers produced different markup.")
+
+        for name, (html, seconds) in results.items():
+            self.stdout.write(f"{name:<32} {seconds * 1000:>10.1f} ms")
+
+        self.stdout.write(self.style.SUCCESS("All renderers produced the same markup."))
+
+    def measure(self, render, repeat: int):
+        html = render()
+        seconds = min(timeit.repeat(render, number=1, repeat=repeat))
+
+        return html, seconds
+
+    def generate_month(
+        self, month: datetime.date, now: datetime.datetime, events_per_day: int
+    ) -> dict:
+        days = []
+        current_date = month
+        first_monday = month - datetime.timedelta(days=month.weekday())
+
+        while first_monday < month:
+            days.append(
+                {
+                    "datetime": datetime.datetime.combine(
+                        first_monday, datetime.time()
+                    ),
+                    "is_weekend": first_monday.weekday() in {5, 6},
+                    "is_previous_month": True,
+                }
+            )
+            first_monday += datetime.timedelta(days=1)
+
+        while current_date.month == month.month:
+            events = sorted(
+                (
+                    EventTile(
+                        get_token(),
+                        f"Event <{index}>",
+                        datetime.time(random.randrange(23)),
+                        datetime.time(23, 30),
+                        is_availability_event=index % 4 == 0,
+                    )
+                    for index in range(events_per_day)
+                ),
+                key=EventTile.sort_key,
+            )
+            events.append(EventTile(get_token(), "All day", None, None))
+
+            days.append(
+                {
+                    "datetime": datetime.datetime.combine(
+                        current_date, datetime.time()
+                    ),
+                    "is_weekend": current_date.weekday() in {5, 6},
+                    "is_previous_month": False,
+                    "events": events,
+                    "has_past_event": current_date < now.date(),
+                    "has_ongoing_event": current_date == now.date(),
+                    "has_future_event": current_date > now.date(),
+                    "availability": (
+                        AvailabilityTile(
+                            get_token(),
+                            [{"token": get_token(), "start": "09:00", "end": "09:30"}],
+                        )
+                        if current_date.day % 2
+                        else None
+                    ),
+                    "notes": [],
+                }
+            )
+            current_date += datetime.timedelta(days=1)
+
+        return {"month": month, "name": month.strftime("%B"), "days": days}
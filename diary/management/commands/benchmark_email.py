@@ -0,0 +1,147 @@
+import socketserver
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from utilities.tasks import (
+    notification,
+    send_bulk_notifications,
+    send_user_notification,
+)
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough SMTP to accept and drop every email, counting them.
+    """
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 sink")
+
+        while line := self.rfile.readline():
+            command = line.decode(errors="replace").strip().upper()
+
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 sink")
+            elif command == "DATA":
+                self.reply("354 end with .")
+
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+
+                with self.server.lock:
+                    self.server.received += 1
+
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                break
+            else:
+                self.reply("250 ok")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpSinkHandler)
+        self.lock = threading.Lock()
+        self.received = 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the same emails to a local SMTP sink with one send_user_notification "
+        "per email and with send_bulk_notifications at several batch sizes, and "
+        "print the throughput of each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=500,
+            help="Number of emails sent by each approach.",
+        )
+        parser.add_argument(
+            "--batch-sizes",
+            type=int,
+            nargs="+",
+            default=[1, 10, 100],
+            help="EMAIL_BATCH_SIZE values to time send_bulk_notifications with.",
+        )
+        parser.add_argument(
+            "--template",
+            default="user_new_account_notification.html",
+            help="Template rendered for every email.",
+        )
+
+    def handle(self, *args, **options):
+        count = options["count"]
+        context = {"confirmation_code": "123456"}
+        recipients = [f"user{index}@example.com" for index in range(count)]
+
+        sink = SmtpSink()
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+
+        try:
+            with override_settings(
+                EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+                EMAIL_HOST=sink.server_address[0],
+                EMAIL_PORT=sink.server_address[1],
+                EMAIL_HOST_USER="",
+                EMAIL_HOST_PASSWORD="",
+                EMAIL_USE_TLS=False,
+                DEFAULT_FROM_EMAIL="benchmark@example.com",
+            ):
+                self.report(
+                    "send_user_notification",
+                    sink,
+                    count,
+                    lambda: [
+                        send_user_notification(
+                            context, "Benchmark", options["template"], [recipient]
+                        )
+                        for recipient in recipients
+                    ],
+                )
+
+                for batch_size in options["batch_sizes"]:
+                    messages = [
+                        notification(
+                            context, "Benchmark", options["template"], [recipient]
+                        )
+                        for recipient in recipients
+                    ]
+
+                    with override_settings(EMAIL_BATCH_SIZE=batch_size):
+                        self.report(
+                            f"send_bulk_notifications, batches of {batch_size}",
+                            sink,
+                            count,
+                            lambda: send_bulk_notifications(messages),
+                        )
+        finally:
+            sink.shutdown()
+            sink.server_close()
+
+    def report(self, name: str, sink: SmtpSink, count: int, send):
+        sink.received = 0
+        started = time.perf_counter()
+        send()
+        elapsed = time.perf_counter() - started
+
+        if sink.received != count:
+            raise CommandError(
+                f"{name}: the sink received {sink.received} of {count} emails."
+            )
+
+        self.stdout.write(
+            f"{name}: {elapsed:.3f}s, {count / elapsed:.0f} emails per second"
+        )
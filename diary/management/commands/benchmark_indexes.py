@@ -0,0 +1,240 @@
+import datetime
+import random
+import re
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from account.models import Accounts, Settings
+from diary.models import (
+    Availability,
+    AvailabilityEvent,
+    AvailabilityTimeSlot,
+    Event,
+    EventInvitation,
+    EventOccurrence,
+    EventReminderType,
+    Section,
+    get_token,
+)
+from utilities.time import time_range_mask
+
+SEQUENTIAL_SCANS_ONLY = [
+    "SET LOCAL enable_indexscan = off",
+    "SET LOCAL enable_indexonlyscan = off",
+    "SET LOCAL enable_bitmapscan = off",
+]
+INDEX_SCANS_ALLOWED = [
+    "SET LOCAL enable_indexscan = on",
+    "SET LOCAL enable_indexonlyscan = on",
+    "SET LOCAL enable_bitmapscan = on",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed rows and print EXPLAIN ANALYZE timings of token, array and date "
+        "lookups without and with their indexes. Requires PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=10000,
+            help="Number of events and availabilities to seed.",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the seeded rows instead of rolling them back.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            samples = self.seed(options["rows"])
+
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+            for name, queryset in self.get_queries(samples).items():
+                before = self.explain(queryset, SEQUENTIAL_SCANS_ONLY)
+                after = self.explain(queryset, INDEX_SCANS_ALLOWED)
+
+                self.stdout.write(
+                    f"{name:<40} {self.execution_time(before):>10} ms"
+                    f" -> {self.execution_time(after):>10} ms"
+                )
+
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"Before:\n{before}\n\nAfter:\n{after}\n")
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+    def seed(self, rows: int) -> dict:
+        user = Accounts(email=f"benchmark-{get_token()}@example.com")
+        user.set_unusable_password()
+        user.save()
+
+        settings = Settings.objects.create(user=user)
+        section = Section.objects.create(user=user, name="Benchmark")
+        guest = Accounts(email=f"benchmark-{get_token()}@example.com")
+        guest.set_unusable_password()
+        guest.save()
+        guest_section = Section.objects.create(user=guest, name="Benchmark")
+
+        first_day = datetime.date.today()
+        days = [first_day + datetime.timedelta(days=offset) for offset in range(365)]
+        reminder_types = list(EventReminderType.values)
+
+        events = Event.objects.bulk_create(
+            [
+                Event(
+                    owner=user,
+                    title=f"Event {index}",
+                    dates=random.sample(days, 3),
+                    starting_time=datetime.time(random.randrange(24)),
+                    ending_time=datetime.time(23, 59),
+                    section=section,
+                    reminders=random.sample(reminder_types, 2),
+                )
+                for index in range(rows)
+            ],
+            batch_size=1000,
+        )
+        EventOccurrence.objects.bulk_create(
+            [
+                EventOccurrence(
+                    event=event,
+                    section=section,
+                    date=date,
+                    start_time=event.starting_time,
+                )
+                for event in events
+                for date in event.dates
+            ],
+            batch_size=1000,
+        )
+        invitations = EventInvitation.objects.bulk_create(
+            [
+                EventInvitation(
+                    event=event,
+                    user=guest,
+                    accepted=True,
+                    section=guest_section,
+                    reminders=event.reminders,
+                )
+                for event in events
+            ],
+            batch_size=1000,
+        )
+
+        # Spread availabilities over several sections so the (section, date)
+        # index has something to narrow down.
+        sections = [section] + Section.objects.bulk_create(
+            [Section(user=user, name=f"Benchmark {index}") for index in range(9)]
+        )
+        availabilities = Availability.objects.bulk_create(
+            [
+                Availability(
+                    user=user,
+                    date=days[index % len(days)],
+                    section=sections[index % len(sections)],
+                    # bulk_create skips the signals keeping the mask in step.
+                    slot_mask=time_range_mask(datetime.time(9), datetime.time(9, 30)),
+                )
+                for index in range(rows)
+            ],
+            batch_size=1000,
+        )
+        time_slots = AvailabilityTimeSlot.objects.bulk_create(
+            [
+                AvailabilityTimeSlot(
+                    availability=availability,
+                    start_time=datetime.time(9),
+                    end_time=datetime.time(9, 30),
+                )
+                for availability in availabilities
+            ],
+            batch_size=1000,
+        )
+        availability_events = AvailabilityEvent.objects.bulk_create(
+            [
+                AvailabilityEvent(
+                    creator=guest.email,
+                    availability=availability,
+                    title="Meeting",
+                    start_time=datetime.time(9),
+                    end_time=datetime.time(9, 30),
+                    address="Office",
+                    reminders=random.sample(reminder_types, 2),
+                )
+                for availability in availabilities
+            ],
+            batch_size=1000,
+        )
+
+        return {
+            "event": random.choice(events),
+            "invitation": random.choice(invitations),
+            "availability": random.choice(availabilities),
+            "time_slot": random.choice(time_slots),
+            "availability_event": random.choice(availability_events),
+            "section": section,
+            "settings": settings,
+            "day": random.choice(days),
+            "reminder": random.choice(reminder_types),
+        }
+
+    def get_queries(self, samples: dict) -> dict:
+        day = samples["day"]
+        reminder = samples["reminder"]
+
+        return {
+            "Event by token": Event.objects.filter(token=samples["event"].token),
+            "EventInvitation by token": EventInvitation.objects.filter(
+                token=samples["invitation"].token
+            ),
+            "Availability by token": Availability.objects.filter(
+                token=samples["availability"].token
+            ),
+            "AvailabilityTimeSlot by token": AvailabilityTimeSlot.objects.filter(
+                token=samples["time_slot"].token
+            ),
+            "AvailabilityEvent by token": AvailabilityEvent.objects.filter(
+                token=samples["availability_event"].token
+            ),
+            "Section by token": Section.objects.filter(token=samples["section"].token),
+            "Settings by token": Settings.objects.filter(
+                token=samples["settings"].token
+            ),
+            "Event dates contain": Event.objects.filter(dates__contains=[day]),
+            "Event reminders contain": Event.objects.filter(
+                reminders__contains=[reminder]
+            ),
+            "EventInvitation reminders contain": EventInvitation.objects.filter(
+                reminders__contains=[reminder]
+            ),
+            "AvailabilityEvent reminders contain": AvailabilityEvent.objects.filter(
+                reminders__contains=[reminder]
+            ),
+            "Availability by section and date": Availability.objects.filter(
+                section=samples["section"], date=day
+            ),
+            "EventOccurrence by section and date": EventOccurrence.objects.filter(
+                section=samples["section"], date=day
+            ),
+        }
+
+    def explain(self, queryset, statements) -> str:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+        return queryset.explain(analyze=True)
+
+    def execution_time(self, plan: str) -> str:
+        match = re.search(r"Execution Time: ([\d.]+) ms", plan)
+
+        return match.group(1) if match else "?"
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import xml.etree.ElementTree as ET
+
+from django.core.management.base import BaseCommand, CommandError
+
+from diary.templatetags.icons import (
+    ICON_DIR,
+    SPRITE_DIR,
+    SPRITE_MANIFEST,
+    sprite_symbol_id,
+)
+
+SVG_NAMESPACE = "http://www.w3.org/2000/svg"
+
+# Everything else stays on the referencing <svg>, so its presentation
+# attributes (fill, stroke, ...) can still be overridden per use.
+SYMBOL_ATTRIBUTES = {"viewBox"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile static/images/icons/*.svg into a single hashed sprite of "
+        "<symbol> elements, used by the icon tag when ICON_SPRITE is enabled."
+    )
+
+    def handle(self, *args, **options):
+        paths = sorted(ICON_DIR.glob("*.svg"))
+
+        if not paths:
+            raise CommandError(f"No icons found in {ICON_DIR}.")
+
+        sprite = ET.Element(f"{{{SVG_NAMESPACE}}}svg")
+        symbols = {}
+
+        for path in paths:
+            root = ET.parse(path).getroot()
+            symbol = ET.SubElement(
+                sprite,
+                f"{{{SVG_NAMESPACE}}}symbol",
+                {
+                    "id": sprite_symbol_id(path.stem),
+                    **{
+                        key: value
+                        for key, value in root.attrib.items()
+                        if key in SYMBOL_ATTRIBUTES
+                    },
+                },
+            )
+            symbol.extend(root)
+            symbols[path.stem] = symbol.get("id")
+
+        content = ET.tostring(sprite, encoding="unicode")
+        digest = hashlib.sha256(content.encode()).hexdigest()[:12]
+        file_name = f"icons.{digest}.svg"
+
+        SPRITE_DIR.mkdir(parents=True, exist_ok=True)
+
+        for old_sprite in SPRITE_DIR.glob("icons.*.svg"):
+            if old_sprite.name != file_name:
+                old_sprite.unlink()
+
+        (SPRITE_DIR / file_name).write_text(content)
+        SPRITE_MANIFEST.write_text(
+            json.dumps(
+                {
+                    "file": f"images/sprites/{file_name}",
+                    "symbols": symbols,
+                },
+                indent=4,
+            )
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Built {file_name} with {len(symbols)} icons.")
+        )
@@ -0,0 +1,227 @@
+import datetime
+import heapq
+import select
+import time
+import typing
+
+import pytz
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import InterfaceError, OperationalError, connection
+from django.db.models import Q
+
+from diary.models import ReminderSchedule
+from diary.reminders import (
+    REMINDER_SCHEDULE_CHANNEL,
+    advance_watermark,
+    get_catch_up_start,
+)
+from diary.tasks import send_schedule_rows
+
+# Changes are re-read with this much overlap, so a row whose transaction
+# committed after a later one was seen is not missed.
+REFRESH_OVERLAP = datetime.timedelta(minutes=1)
+
+# How long to wait before reconnecting after the database went away.
+RECONNECT_SECONDS = 5
+
+
+class Command(BaseCommand):
+    help = (
+        "Send reminders from the schedule table as they become due, instead "
+        "of the periodic check_reminders task. Keeps the next hours of the "
+        "schedule in memory and sleeps until the next one, woken by schedule "
+        "changes through LISTEN/NOTIFY on PostgreSQL or by polling elsewhere. "
+        "Enable REMINDER_DISPATCHER so Celery beat stops scheduling the task."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horizon-hours",
+            type=float,
+            default=6,
+            help="How far ahead reminders are kept in memory.",
+        )
+        parser.add_argument(
+            "--poll-seconds",
+            type=float,
+            default=30,
+            help=(
+                "How often to look for schedule changes, on top of the "
+                "notifications on PostgreSQL."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if not settings.REMINDER_SCHEDULE:
+            raise CommandError("The dispatcher requires REMINDER_SCHEDULE.")
+
+        dispatcher = ReminderDispatcher(
+            datetime.timedelta(hours=options["horizon_hours"]),
+            options["poll_seconds"],
+        )
+
+        mode = "notified" if dispatcher.listen() else "polling"
+        self.stdout.write(f"Dispatching reminders ({mode}).")
+
+        try:
+            dispatcher.run()
+        except KeyboardInterrupt:
+            pass
+
+
+class ReminderDispatcher:
+    """
+    A heap of the unsent schedule rows due within the horizon, ordered by fire
+    time.
+
+    Heap entries are never removed in place: a moved row is pushed again and
+    `queued` tells which entry is current. Rows are read again right before
+    they are sent, so deleted, moved or already sent ones are skipped.
+    """
+
+    def __init__(self, horizon: datetime.timedelta, poll_seconds: float):
+        self.horizon = horizon
+        self.poll_seconds = poll_seconds
+        self.heap: typing.List[typing.Tuple[datetime.datetime, int]] = []
+        self.queued: typing.Dict[int, datetime.datetime] = {}
+        self.loaded_until: typing.Optional[datetime.datetime] = None
+        self.changed_since: typing.Optional[datetime.datetime] = None
+        self.processed_until: typing.Optional[datetime.datetime] = None
+        self.listening = False
+
+    def listen(self) -> bool:
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {REMINDER_SCHEDULE_CHANNEL}")
+
+            self.listening = True
+
+        return self.listening
+
+    def push(self, pk: int, fire_at: datetime.datetime):
+        if self.queued.get(pk) != fire_at:
+            self.queued[pk] = fire_at
+            heapq.heappush(self.heap, (fire_at, pk))
+
+    def reload(self, now: datetime.datetime):
+        """
+        Load the whole horizon again, starting with what became due while the
+        dispatcher was not running.
+        """
+        self.heap = []
+        self.queued = {}
+        self.loaded_until = now + self.horizon
+        self.changed_since = now
+        self.processed_until = get_catch_up_start("schedule", now)
+
+        for pk, fire_at in ReminderSchedule.objects.filter(
+            sent_at__isnull=True,
+            fire_at__gt=self.processed_until,
+            fire_at__lte=self.loaded_until,
+        ).values_list("pk", "fire_at"):
+            self.push(pk, fire_at)
+
+    def refresh(self, now: datetime.datetime):
+        """
+        Queue the rows created or moved within the horizon since the last look,
+        and any unsent row that became due since the watermark, whenever its
+        transaction committed.
+        """
+        changed = ReminderSchedule.objects.filter(
+            Q(updated_at__gt=self.changed_since - REFRESH_OVERLAP)
+            | Q(fire_at__lte=now),
+            sent_at__isnull=True,
+            fire_at__gt=self.processed_until,
+            fire_at__lte=self.loaded_until,
+        ).values_list("pk", "fire_at")
+        self.changed_since = now
+
+        for pk, fire_at in changed:
+            self.push(pk, fire_at)
+
+    def dispatch(self, now: datetime.datetime):
+        due = []
+
+        while self.heap and self.heap[0][0] <= now:
+            fire_at, pk = heapq.heappop(self.heap)
+
+            if self.queued.get(pk) == fire_at:
+                del self.queued[pk]
+                due.append(pk)
+
+        if due:
+            send_schedule_rows(
+                ReminderSchedule.objects.filter(pk__in=due, fire_at__lte=now), now
+            )
+
+        # Rows changed since the last refresh, or committed late within the
+        # overlap, may not be queued yet, so the watermark stays behind them
+        # and a fallback to the periodic task can still send them.
+        processed_until = min(now, self.changed_since - REFRESH_OVERLAP)
+
+        if processed_until > self.processed_until:
+            self.processed_until = processed_until
+            advance_watermark("schedule", processed_until)
+
+    def wait(self, seconds: float) -> bool:
+        """
+        Sleep up to `seconds`, returning whether the schedule changed.
+        """
+        if not self.listening:
+            time.sleep(seconds)
+
+            return False
+
+        pg_connection = connection.connection
+        select.select([pg_connection], [], [], seconds)
+
+        with connection.wrap_database_errors:
+            pg_connection.poll()
+
+        notified = bool(pg_connection.notifies)
+        pg_connection.notifies.clear()
+
+        return notified
+
+    def run(self):
+        connected = True
+        notified = False
+        next_poll = None
+
+        while True:
+            try:
+                if not connected:
+                    self.listen()
+                    self.loaded_until = None
+                    connected = True
+
+                now = datetime.datetime.now(tz=pytz.utc)
+
+                if (
+                    self.loaded_until is None
+                    or now >= self.loaded_until - self.horizon / 2
+                ):
+                    self.reload(now)
+                    next_poll = now + datetime.timedelta(seconds=self.poll_seconds)
+                elif notified or now >= next_poll:
+                    self.refresh(now)
+                    next_poll = now + datetime.timedelta(seconds=self.poll_seconds)
+
+                self.dispatch(now)
+
+                next_wake = self.loaded_until - self.horizon / 2
+
+                if self.heap:
+                    next_wake = min(next_wake, self.heap[0][0])
+
+                # Polled even when notified of changes, for rows committed
+                # late and to keep the watermark moving.
+                next_wake = min(next_wake, next_poll)
+
+                notified = self.wait(max((next_wake - now).total_seconds(), 0))
+            except (OperationalError, InterfaceError):
+                connection.close()
+                connected = False
+                notified = False
+                time.sleep(RECONNECT_SECONDS)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from diary.models import Section
+from diary.summaries import rebuild_day_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the day summaries of every section from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--section",
+            action="append",
+            dest="sections",
+            help="Token of a section to rebuild. Can be passed multiple times.",
+        )
+
+    def handle(self, *args, **options):
+        sections = Section.objects.order_by("pk")
+
+        if options["sections"]:
+            sections = sections.filter(token__in=options["sections"])
+
+        total = 0
+
+        for section in sections.iterator():
+            total += rebuild_day_summaries(section)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} day summaries."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from diary.reminders import rebuild_reminder_schedule
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the reminder schedule table from every event, accepted "
+        "invitation and availability event with reminders. Safe to run again: "
+        "sent reminders are kept and unsent ones are brought up to date."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_reminder_schedule()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Scheduled the reminders of {count} objects.")
+        )
@@ -0,0 +1,77 @@
+import dataclasses
+import typing
+
+import pytz
+from django.db.models import OuterRef, Subquery
+from django.http import Http404
+from django.utils.functional import SimpleLazyObject
+
+from account.models import Settings
+from utilities.time import get_timezone
+
+from .models import Section
+
+
+@dataclasses.dataclass
+class UserContext:
+    time_zone: typing.Optional[str]
+    sections: typing.List[Section]
+
+    @property
+    def timezone(self) -> pytz.BaseTzInfo:
+        if self.time_zone is None:
+            raise Http404("No Settings matches the given query.")
+
+        return get_timezone(self.time_zone)
+
+    def get_section(self, token: str) -> Section:
+        for section in self.sections:
+            if section.token == token:
+                return section
+
+        raise Http404("No Section matches the given query.")
+
+
+def load_user_context(user) -> UserContext:
+    """
+    Load the settings and sections of a user in a single query.
+
+    The time zone is attached to every section row through a subquery, so the
+    separate settings lookup is only needed for users without any section.
+    """
+    if user.is_anonymous:
+        return UserContext(time_zone="UTC", sections=[])
+
+    time_zone = Settings.objects.filter(user=OuterRef("user")).values("time_zone")
+    sections = list(
+        Section.objects.filter(user=user)
+        .annotate(settings_time_zone=Subquery(time_zone[:1]))
+        .order_by("pk")
+    )
+
+    if sections:
+        return UserContext(time_zone=sections[0].settings_time_zone, sections=sections)
+
+    return UserContext(
+        time_zone=Settings.objects.filter(user=user)
+        .values_list("time_zone", flat=True)
+        .first(),
+        sections=sections,
+    )
+
+
+class UserContextMiddleware:
+    """
+    Attach a lazily loaded `request.user_context` to every request.
+
+    Views and templates read the user's time zone and sections from it instead
+    of querying Settings and `user.sections` on their own.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user_context = SimpleLazyObject(lambda: load_user_context(request.user))
+
+        return self.get_response(request)
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diary", "0008_add_description_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DaySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("event_count", models.PositiveIntegerField(default=0)),
+                ("earliest_start", models.TimeField(blank=True, null=True)),
+                ("latest_end", models.TimeField(blank=True, null=True)),
+                ("has_all_day_event", models.BooleanField(default=False)),
+                ("has_availability", models.BooleanField(default=False)),
+                (
+                    "section",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="day_summaries",
+                        to="diary.section",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("section", "date"), name="unique_section_day_summary"
+                    )
+                ],
+            },
+        ),
+    ]
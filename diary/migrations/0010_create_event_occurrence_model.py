@@ -0,0 +1,88 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_event_occurrences(apps, schema_editor):
+    Event = apps.get_model("diary", "Event")
+    EventOccurrence = apps.get_model("diary", "EventOccurrence")
+
+    occurrences = []
+
+    for event in Event.objects.only(
+        "id", "section_id", "dates", "starting_time"
+    ).iterator(chunk_size=1000):
+        occurrences.extend(
+            EventOccurrence(
+                event_id=event.id,
+                section_id=event.section_id,
+                date=date,
+                start_time=event.starting_time,
+            )
+            for date in set(event.dates)
+        )
+
+        if len(occurrences) >= 1000:
+            EventOccurrence.objects.bulk_create(occurrences)
+            occurrences = []
+
+    EventOccurrence.objects.bulk_create(occurrences)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diary", "0009_create_day_summary_model"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventOccurrence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("start_time", models.TimeField(blank=True, null=True)),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="occurrences",
+                        to="diary.event",
+                    ),
+                ),
+                (
+                    "section",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="event_occurrences",
+                        to="diary.section",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["section", "date"], name="event_occurrence_section_date"
+                    ),
+                    models.Index(
+                        fields=["date", "start_time"], name="event_occurrence_date_time"
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("event", "date"), name="unique_event_occurrence"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_event_occurrences, migrations.RunPython.noop),
+    ]
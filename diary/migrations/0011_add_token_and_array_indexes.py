@@ -0,0 +1,89 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:15
+
+import diary.models
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diary", "0010_create_event_occurrence_model"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="availability",
+            name="token",
+            field=models.CharField(
+                db_index=True, default=diary.models.get_token, max_length=100
+            ),
+        ),
+        migrations.AlterField(
+            model_name="availabilityevent",
+            name="token",
+            field=models.CharField(
+                db_index=True, default=diary.models.get_token, max_length=100
+            ),
+        ),
+        migrations.AlterField(
+            model_name="availabilitytimeslot",
+            name="token",
+            field=models.CharField(
+                db_index=True, default=diary.models.get_token, max_length=100
+            ),
+        ),
+        migrations.AlterField(
+            model_name="event",
+            name="token",
+            field=models.CharField(
+                db_index=True, default=diary.models.get_token, max_length=100
+            ),
+        ),
+        migrations.AlterField(
+            model_name="eventinvitation",
+            name="token",
+            field=models.CharField(
+                db_index=True, default=diary.models.get_token, max_length=100
+            ),
+        ),
+        migrations.AlterField(
+            model_name="section",
+            name="token",
+            field=models.CharField(
+                db_index=True, default=diary.models.get_token, max_length=100
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="availability",
+            index=models.Index(
+                fields=["section", "date"], name="availability_section_date"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="availabilityevent",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["reminders"], name="availability_event_remind_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["dates"], name="event_dates_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["reminders"], name="event_reminders_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="eventinvitation",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["reminders"], name="event_invitation_reminders_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:17
+
+import django.contrib.postgres.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diary", "0011_add_token_and_array_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="recurrence_count",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="recurrence_exceptions",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.DateField(), default=list, size=None
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="recurrence_frequency",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("daily", "Daily"),
+                    ("weekly", "Weekly"),
+                    ("monthly", "Monthly"),
+                ],
+                max_length=10,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="recurrence_interval",
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="recurrence_until",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                condition=models.Q(("recurrence_frequency__isnull", False)),
+                fields=["section"],
+                name="event_recurring_section",
+            ),
+        ),
+    ]
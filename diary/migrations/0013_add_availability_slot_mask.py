@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:28
+
+import collections
+
+from django.db import migrations, models
+
+
+def populate_slot_masks(apps, schema_editor):
+    Availability = apps.get_model("diary", "Availability")
+    AvailabilityTimeSlot = apps.get_model("diary", "AvailabilityTimeSlot")
+
+    masks = collections.defaultdict(int)
+
+    for availability_id, start_time in AvailabilityTimeSlot.objects.values_list(
+        "availability_id", "start_time"
+    ).iterator(chunk_size=1000):
+        masks[availability_id] |= 1 << (start_time.hour * 2 + start_time.minute // 30)
+
+    Availability.objects.bulk_update(
+        [
+            Availability(pk=availability_id, slot_mask=mask)
+            for availability_id, mask in masks.items()
+        ],
+        ["slot_mask"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diary", "0012_add_event_recurrence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="availability",
+            name="slot_mask",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_slot_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diary", "0013_add_availability_slot_mask"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderSchedule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "reminder_type",
+                    models.CharField(
+                        choices=[
+                            ("week_before", "One week before"),
+                            ("day_before", "One day before"),
+                            ("12_hours_before", "12 hours before"),
+                            ("6_hours_before", "6 hours before"),
+                            ("hour_before", "One hour before"),
+                            ("30_minutes_before", "30 minutes before"),
+                            ("15_minutes_before", "15 minutes before"),
+                            ("minute_before", "One minute before"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("occurrence_date", models.DateField()),
+                ("fire_at", models.DateTimeField()),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "availability_event",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reminder_schedule",
+                        to="diary.availabilityevent",
+                    ),
+                ),
+                (
+                    "event",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reminder_schedule",
+                        to="diary.event",
+                    ),
+                ),
+                (
+                    "invitation",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reminder_schedule",
+                        to="diary.eventinvitation",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("sent_at__isnull", True)),
+                        fields=["fire_at"],
+                        name="reminder_schedule_due",
+                    )
+                ],
+                "constraints": [
+                    models.CheckConstraint(
+                        condition=models.Q(
+                            models.Q(
+                                ("availability_event__isnull", True),
+                                ("event__isnull", False),
+                                ("invitation__isnull", True),
+                            ),
+                            models.Q(
+                                ("availability_event__isnull", True),
+                                ("event__isnull", True),
+                                ("invitation__isnull", False),
+                            ),
+                            models.Q(
+                                ("availability_event__isnull", False),
+                                ("event__isnull", True),
+                                ("invitation__isnull", True),
+                            ),
+                            _connector="OR",
+                        ),
+                        name="reminder_schedule_single_target",
+                    ),
+                    models.UniqueConstraint(
+                        fields=("event", "reminder_type", "occurrence_date"),
+                        name="unique_event_reminder",
+                    ),
+                    models.UniqueConstraint(
+                        fields=("invitation", "reminder_type", "occurrence_date"),
+                        name="unique_invitation_reminder",
+                    ),
+                    models.UniqueConstraint(
+                        fields=(
+                            "availability_event",
+                            "reminder_type",
+                            "occurrence_date",
+                        ),
+                        name="unique_availability_event_reminder",
+                    ),
+                ],
+            },
+        ),
+    ]
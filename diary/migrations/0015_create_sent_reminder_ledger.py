@@ -0,0 +1,112 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diary", "0014_create_reminder_schedule_model"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=20, unique=True)),
+                ("processed_until", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SentReminder",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "reminder_type",
+                    models.CharField(
+                        choices=[
+                            ("week_before", "One week before"),
+                            ("day_before", "One day before"),
+                            ("12_hours_before", "12 hours before"),
+                            ("6_hours_before", "6 hours before"),
+                            ("hour_before", "One hour before"),
+                            ("30_minutes_before", "30 minutes before"),
+                            ("15_minutes_before", "15 minutes before"),
+                            ("minute_before", "One minute before"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("occurrence_date", models.DateField()),
+                ("sent_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "availability_event",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sent_reminders",
+                        to="diary.availabilityevent",
+                    ),
+                ),
+                (
+                    "event",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sent_reminders",
+                        to="diary.event",
+                    ),
+                ),
+                (
+                    "invitation",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sent_reminders",
+                        to="diary.eventinvitation",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("event", "reminder_type", "occurrence_date"),
+                        name="unique_sent_event_reminder",
+                    ),
+                    models.UniqueConstraint(
+                        fields=("invitation", "reminder_type", "occurrence_date"),
+                        name="unique_sent_invitation_reminder",
+                    ),
+                    models.UniqueConstraint(
+                        fields=(
+                            "availability_event",
+                            "reminder_type",
+                            "occurrence_date",
+                        ),
+                        name="unique_sent_availability_event_reminder",
+                    ),
+                ],
+            },
+        ),
+    ]
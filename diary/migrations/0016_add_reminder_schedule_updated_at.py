@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diary", "0015_create_sent_reminder_ledger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reminderschedule",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,175 @@
+import datetime
+
+import pytz
+from dateutil import rrule
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Q
+
+# Copies of the constants of diary.models and diary.reminders at the time of
+# this migration.
+REMINDER_OFFSETS = {
+    "minute_before": datetime.timedelta(minutes=1),
+    "15_minutes_before": datetime.timedelta(minutes=15),
+    "30_minutes_before": datetime.timedelta(minutes=30),
+    "hour_before": datetime.timedelta(hours=1),
+    "6_hours_before": datetime.timedelta(hours=6),
+    "12_hours_before": datetime.timedelta(hours=12),
+    "day_before": datetime.timedelta(hours=24),
+    "week_before": datetime.timedelta(days=7),
+}
+RECURRENCE_RULE_FREQUENCIES = {
+    "daily": rrule.DAILY,
+    "weekly": rrule.WEEKLY,
+    "monthly": rrule.MONTHLY,
+}
+RECURRING_SCHEDULE_DAYS = 14
+
+
+def get_timezone(time_zone):
+    try:
+        return pytz.timezone(time_zone or settings.TIME_ZONE)
+    except pytz.UnknownTimeZoneError:
+        return pytz.timezone(settings.TIME_ZONE)
+
+
+def event_dates(event, today):
+    dates = set(event.dates) - set(event.recurrence_exceptions)
+
+    if event.recurrence_frequency and event.dates:
+        rule = rrule.rrule(
+            RECURRENCE_RULE_FREQUENCIES[event.recurrence_frequency],
+            dtstart=datetime.datetime.combine(min(event.dates), datetime.time()),
+            interval=event.recurrence_interval,
+            until=(
+                datetime.datetime.combine(event.recurrence_until, datetime.time())
+                if event.recurrence_until
+                else None
+            ),
+            count=event.recurrence_count,
+        )
+        dates.update(
+            occurrence.date()
+            for occurrence in rule.between(
+                datetime.datetime.combine(
+                    today - datetime.timedelta(days=1), datetime.time()
+                ),
+                datetime.datetime.combine(
+                    today + datetime.timedelta(days=RECURRING_SCHEDULE_DAYS),
+                    datetime.time(),
+                ),
+                inc=True,
+            )
+            if occurrence.date() not in event.recurrence_exceptions
+        )
+
+    return dates
+
+
+def schedule_rows(ReminderSchedule, dates, starting_time, reminders, tz, now, **target):
+    if starting_time is None:
+        return
+
+    for date in dates:
+        starts_at = tz.localize(
+            datetime.datetime.combine(date, starting_time)
+        ).astimezone(pytz.utc)
+
+        for reminder_type in reminders:
+            if reminder_type not in REMINDER_OFFSETS:
+                continue
+
+            fire_at = starts_at - REMINDER_OFFSETS[reminder_type]
+
+            if fire_at > now:
+                yield ReminderSchedule(
+                    reminder_type=reminder_type,
+                    occurrence_date=date,
+                    fire_at=fire_at,
+                    **target,
+                )
+
+
+def backfill_reminder_schedule(apps, schema_editor):
+    """
+    Schedule the reminders of everything created before the schedule table,
+    so turning REMINDER_SCHEDULE on does not silence them.
+    """
+    Settings = apps.get_model("account", "Settings")
+    Event = apps.get_model("diary", "Event")
+    AvailabilityEvent = apps.get_model("diary", "AvailabilityEvent")
+    ReminderSchedule = apps.get_model("diary", "ReminderSchedule")
+
+    now = datetime.datetime.now(tz=pytz.utc)
+    time_zones = dict(Settings.objects.values_list("user_id", "time_zone"))
+    rows = []
+
+    for event in (
+        Event.objects.filter(
+            Q(reminders__len__gt=0) | Q(invitations__reminders__len__gt=0)
+        )
+        .distinct()
+        .prefetch_related("invitations")
+        .iterator(chunk_size=500)
+    ):
+        tz = get_timezone(time_zones.get(event.owner_id))
+        dates = event_dates(event, now.date())
+
+        rows.extend(
+            schedule_rows(
+                ReminderSchedule,
+                dates,
+                event.starting_time,
+                event.reminders,
+                tz,
+                now,
+                event=event,
+            )
+        )
+
+        for invitation in event.invitations.all():
+            if invitation.accepted:
+                rows.extend(
+                    schedule_rows(
+                        ReminderSchedule,
+                        dates,
+                        event.starting_time,
+                        invitation.reminders,
+                        tz,
+                        now,
+                        invitation=invitation,
+                    )
+                )
+
+    for availability_event in (
+        AvailabilityEvent.objects.filter(reminders__len__gt=0)
+        .select_related("availability")
+        .iterator(chunk_size=500)
+    ):
+        availability = availability_event.availability
+
+        rows.extend(
+            schedule_rows(
+                ReminderSchedule,
+                [availability.date],
+                availability_event.start_time,
+                availability_event.reminders,
+                get_timezone(time_zones.get(availability.user_id)),
+                now,
+                availability_event=availability_event,
+            )
+        )
+
+    ReminderSchedule.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0007_add_settings_token_index"),
+        ("diary", "0016_add_reminder_schedule_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_reminder_schedule, migrations.RunPython.noop),
+    ]
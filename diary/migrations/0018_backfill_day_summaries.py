@@ -0,0 +1,81 @@
+from django.db import migrations
+
+
+def populate_day_summaries(apps, schema_editor):
+    """
+    Same aggregation as `diary.summaries.rebuild_day_summaries`, for every
+    section at once.
+    """
+    Availability = apps.get_model("diary", "Availability")
+    AvailabilityEvent = apps.get_model("diary", "AvailabilityEvent")
+    DaySummary = apps.get_model("diary", "DaySummary")
+    EventOccurrence = apps.get_model("diary", "EventOccurrence")
+
+    summaries = {}
+
+    def summary_for(section_id, date):
+        if (section_id, date) not in summaries:
+            summaries[(section_id, date)] = DaySummary(section_id=section_id, date=date)
+
+        return summaries[(section_id, date)]
+
+    def add(section_id, date, starting_time, ending_time):
+        summary = summary_for(section_id, date)
+        summary.event_count += 1
+
+        if starting_time is None:
+            summary.has_all_day_event = True
+            return
+
+        if summary.earliest_start is None or starting_time < summary.earliest_start:
+            summary.earliest_start = starting_time
+
+        if summary.latest_end is None or ending_time > summary.latest_end:
+            summary.latest_end = ending_time
+
+    rows = (
+        EventOccurrence.objects.values_list(
+            "section_id", "date", "event__starting_time", "event__ending_time"
+        ).iterator(chunk_size=1000),
+        EventOccurrence.objects.filter(
+            event__invitations__section__isnull=False,
+            event__invitations__accepted=True,
+        )
+        .values_list(
+            "event__invitations__section_id",
+            "date",
+            "event__starting_time",
+            "event__ending_time",
+        )
+        .iterator(chunk_size=1000),
+        AvailabilityEvent.objects.values_list(
+            "availability__section_id",
+            "availability__date",
+            "start_time",
+            "end_time",
+        ).iterator(chunk_size=1000),
+    )
+
+    for queryset_rows in rows:
+        for section_id, date, starting_time, ending_time in queryset_rows:
+            add(section_id, date, starting_time, ending_time)
+
+    for section_id, date in Availability.objects.values_list(
+        "section_id", "date"
+    ).iterator(chunk_size=1000):
+        summary_for(section_id, date).has_availability = True
+
+    DaySummary.objects.all().delete()
+    DaySummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diary", "0010_create_event_occurrence_model"),
+        ("diary", "0017_backfill_reminder_schedule"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_day_summaries, migrations.RunPython.noop),
+    ]
@@ -1,18 +1,28 @@
 from __future__ import annotations
 
 import datetime
+import functools
 import json
 import secrets
 import typing
 
+from dateutil import rrule
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models, transaction
 from django.urls import reverse
 
 from account.models import Accounts
-from utilities.tasks import send_user_notification
-from utilities.time import time_slots
+from utilities.tasks import enqueue_notifications, notification, send_user_notification
+from utilities.time import (
+    FULL_DAY_SLOT_MASK,
+    TimeSlot,
+    adjacent_time_slots,
+    time_range_mask,
+)
+
+from .intervals import AvailabilityIntervals
 
 
 def get_token():
@@ -30,8 +40,25 @@ class EventReminderType(models.TextChoices):
     MINUTE_BEFORE = "minute_before", "One minute before"
 
 
+class RecurrenceFrequency(models.TextChoices):
+    DAILY = "daily", "Daily"
+    WEEKLY = "weekly", "Weekly"
+    MONTHLY = "monthly", "Monthly"
+
+
+RECURRENCE_RULE_FREQUENCIES = {
+    RecurrenceFrequency.DAILY: rrule.DAILY,
+    RecurrenceFrequency.WEEKLY: rrule.WEEKLY,
+    RecurrenceFrequency.MONTHLY: rrule.MONTHLY,
+}
+
+
+# Fields copied into or deciding the EventOccurrence rows of an event.
+OCCURRENCE_FIELDS = {"dates", "section", "starting_time", "recurrence_exceptions"}
+
+
 class Event(models.Model):
-    token = models.CharField(max_length=100, default=get_token)
+    token = models.CharField(max_length=100, default=get_token, db_index=True)
     owner = models.ForeignKey(Accounts, on_delete=models.CASCADE, related_name="events")
     title = models.CharField(max_length=120)
     description = models.TextField(null=True, blank=True)
@@ -49,6 +76,13 @@ class Event(models.Model):
         models.CharField(max_length=20, choices=EventReminderType.choices),
         default=list,
     )
+    recurrence_frequency = models.CharField(
+        max_length=10, choices=RecurrenceFrequency.choices, null=True, blank=True
+    )
+    recurrence_interval = models.PositiveSmallIntegerField(default=1)
+    recurrence_until = models.DateField(null=True, blank=True)
+    recurrence_count = models.PositiveIntegerField(null=True, blank=True)
+    recurrence_exceptions = ArrayField(models.DateField(), default=list)
 
     @property
     def stringified_dates(self):
@@ -66,9 +100,103 @@ class Event(models.Model):
     def pending_invitations(self):
         return self.invitations.filter(accepted=False)
 
+    @property
+    def is_recurring(self) -> bool:
+        return bool(self.recurrence_frequency) and len(self.dates) > 0
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["dates"], name="event_dates_gin"),
+            GinIndex(fields=["reminders"], name="event_reminders_gin"),
+            models.Index(
+                fields=["section"],
+                condition=models.Q(recurrence_frequency__isnull=False),
+                name="event_recurring_section",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.title} event of {self.user.email}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            if update_fields is None or OCCURRENCE_FIELDS.intersection(update_fields):
+                self.sync_occurrences()
+
+    def sync_occurrences(self):
+        dates = set(self.dates) - set(self.recurrence_exceptions)
+
+        self.occurrences.exclude(date__in=dates).delete()
+        self.occurrences.exclude(
+            section_id=self.section_id, start_time=self.starting_time
+        ).update(section_id=self.section_id, start_time=self.starting_time)
+
+        existing = set(self.occurrences.values_list("date", flat=True))
+
+        EventOccurrence.objects.bulk_create(
+            [
+                EventOccurrence(
+                    event=self,
+                    section_id=self.section_id,
+                    date=date,
+                    start_time=self.starting_time,
+                )
+                for date in dates - existing
+            ]
+        )
+
+    def get_recurrence_rule(self) -> typing.Optional[rrule.rrule]:
+        if not self.is_recurring:
+            return None
+
+        return rrule.rrule(
+            RECURRENCE_RULE_FREQUENCIES[self.recurrence_frequency],
+            dtstart=datetime.datetime.combine(min(self.dates), datetime.time()),
+            interval=self.recurrence_interval,
+            until=(
+                datetime.datetime.combine(self.recurrence_until, datetime.time())
+                if self.recurrence_until
+                else None
+            ),
+            count=self.recurrence_count,
+        )
+
+    def get_recurring_dates(
+        self, start_date: datetime.date, end_date: datetime.date
+    ) -> typing.List[datetime.date]:
+        """
+        Dates generated by the recurrence rule between two dates.
+
+        Only the requested window is expanded. Explicit dates are left out, as
+        they already have occurrence rows, and so are the exceptions.
+        """
+        rule = self.get_recurrence_rule()
+
+        if rule is None:
+            return []
+
+        skipped = set(self.dates) | set(self.recurrence_exceptions)
+
+        return [
+            occurrence.date()
+            for occurrence in rule.between(
+                datetime.datetime.combine(start_date, datetime.time()),
+                datetime.datetime.combine(end_date, datetime.time()),
+                inc=True,
+            )
+            if occurrence.date() not in skipped
+        ]
+
+    def occurs_on(self, date: datetime.date) -> bool:
+        if date in self.recurrence_exceptions:
+            return False
+
+        return date in self.dates or len(self.get_recurring_dates(date, date)) > 0
+
     def delete(self, using=None, keep_parents=False):
         emails_to_notify = [
             invitation.user.email for invitation in self.accepted_invitations
@@ -82,11 +210,15 @@ class Event(models.Model):
             "event_ending_time": self.ending_time,
         }
 
-        send_user_notification.delay(
-            context,
-            f"Calendar Cards — {self.title}",
-            "diary/email/event_deletion.html",
-            emails_to_notify,
+        enqueue_notifications(
+            [
+                notification(
+                    context,
+                    f"Calendar Cards — {self.title}",
+                    "diary/email/event_deletion.html",
+                    emails_to_notify,
+                )
+            ]
         )
 
         return super().delete(using, keep_parents)
@@ -128,16 +260,49 @@ class Event(models.Model):
             + reverse("event_details", args=[self.token]),
         }
 
-        send_user_notification.delay(
-            context,
-            f"Calendar Cards — {self.title}",
-            "diary/email/event_update.html",
-            emails,
+        enqueue_notifications(
+            [
+                notification(
+                    context,
+                    f"Calendar Cards — {self.title}",
+                    "diary/email/event_update.html",
+                    emails,
+                )
+            ]
         )
 
 
+class EventOccurrence(models.Model):
+    event = models.ForeignKey(
+        Event, on_delete=models.CASCADE, related_name="occurrences"
+    )
+    section = models.ForeignKey(
+        "Section", on_delete=models.CASCADE, related_name="event_occurrences"
+    )
+    date = models.DateField()
+    start_time = models.TimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "date"], name="unique_event_occurrence"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["section", "date"], name="event_occurrence_section_date"
+            ),
+            models.Index(
+                fields=["date", "start_time"], name="event_occurrence_date_time"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event.title} on {self.date}"
+
+
 class EventInvitation(models.Model):
-    token = models.CharField(max_length=100, default=get_token)
+    token = models.CharField(max_length=100, default=get_token, db_index=True)
     event = models.ForeignKey(
         Event, on_delete=models.CASCADE, related_name="invitations"
     )
@@ -157,6 +322,11 @@ class EventInvitation(models.Model):
         default=list,
     )
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=["reminders"], name="event_invitation_reminders_gin"),
+        ]
+
     def __str__(self):
         return f"Event invitation for {self.event.title} to {self.user.email}"
 
@@ -180,7 +350,7 @@ class EventInvitation(models.Model):
 
 
 class AvailabilityTimeSlot(models.Model):
-    token = models.CharField(max_length=100, default=get_token)
+    token = models.CharField(max_length=100, default=get_token, db_index=True)
     availability = models.ForeignKey(
         "Availability", on_delete=models.CASCADE, related_name="time_slots"
     )
@@ -192,7 +362,7 @@ class AvailabilityTimeSlot(models.Model):
 
 
 class Availability(models.Model):
-    token = models.CharField(max_length=100, default=get_token)
+    token = models.CharField(max_length=100, default=get_token, db_index=True)
     user = models.ForeignKey(Accounts, on_delete=models.CASCADE)
     starting_time = models.TimeField(null=True, blank=True)
     ending_time = models.TimeField(null=True, blank=True)
@@ -200,6 +370,14 @@ class Availability(models.Model):
     section = models.ForeignKey(
         "Section", on_delete=models.CASCADE, related_name="availabilities"
     )
+    # Bit i is set when `time_slots[i]` is offered, kept in step with the
+    # AvailabilityTimeSlot rows by the signals.
+    slot_mask = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["section", "date"], name="availability_section_date"),
+        ]
 
     @property
     def jsonified_time_slots(self) -> typing.List[typing.Dict[str, str]]:
@@ -214,98 +392,48 @@ class Availability(models.Model):
             ]
         )
 
+    @functools.cached_property
+    def intervals(self) -> AvailabilityIntervals:
+        """
+        Offered and booked intervals, loaded once per instance so the slot
+        checks and a booking's validation share a single events query.
+        """
+        return AvailabilityIntervals.from_availability(self)
+
     @property
-    def adjacent_time_slots(self) -> typing.List[AvailabilityTimeSlot]:
-        slots = [[]]
-        current_index = 0
-
-        for time_slot in time_slots:
-            if self.time_slots.filter(
-                start_time=time_slot.start, end_time=time_slot.end
-            ).exists():
-                slots[current_index].append(time_slot)
-            else:
-                if len(slots[current_index]) > 0:
-                    current_index += 1
-                    slots.append([])
-
-        return slots
+    def adjacent_time_slots(self) -> typing.List[typing.List[TimeSlot]]:
+        return adjacent_time_slots(self.slot_mask)
 
     @property
     def adjacent_available_time_slots(
         self,
-    ) -> typing.List[typing.List[AvailabilityTimeSlot]]:
-        slots = [[]]
-        current_index = 0
-
-        for time_slot in time_slots:
-            if self.time_range_is_available(time_slot.start, time_slot.end):
-                slots[current_index].append(time_slot)
-            else:
-                if len(slots[current_index]) > 0:
-                    current_index += 1
-                    slots.append([])
-
-        return slots
+    ) -> typing.List[typing.List[TimeSlot]]:
+        return adjacent_time_slots(self.intervals.available_slot_mask)
 
     @property
     def has_available_time_slot(self) -> bool:
-        for time_slot in time_slots:
-            if self.time_range_is_available(time_slot.start, time_slot.end):
-                return True
-
-        return False
+        return self.intervals.available_slot_mask != 0
 
     @property
     def has_vacant_time_slot(self) -> bool:
-        for time_slot in time_slots:
-            if self.time_range_is_vacant(time_slot.start, time_slot.end):
-                return True
-
-        return False
+        return self.slot_mask != FULL_DAY_SLOT_MASK
 
     def time_range_is_vacant(
         self, start_time: datetime.time, end_time: datetime.time
     ) -> bool:
-        if end_time == datetime.time(0, 0):
-            end_time = datetime.time(23, 59, 59, 999)
-
-        for time_slot in self.time_slots.all():
-            end = (
-                datetime.time(23, 59, 59, 999)
-                if time_slot.end_time == datetime.time(0, 0)
-                else time_slot.end_time
-            )
-
-            if time_slot.start_time <= start_time < end:
-                return False
-
-            if time_slot.start_time < end_time <= end:
-                return False
-
-        return True
+        return self.slot_mask & time_range_mask(start_time, end_time) == 0
 
     def time_range_is_available(
         self, start_time: datetime.time, end_time: datetime.time
     ) -> bool:
-        if self.time_range_is_vacant(start_time, end_time):
-            return False
-
-        for event in self.events.all():
-            if event.start_time <= start_time < event.end_time:
-                return False
-
-            if event.start_time < end_time <= event.end_time:
-                return False
-
-        return True
+        return self.intervals.time_range_is_available(start_time, end_time)
 
     def __str__(self):
         return f"{self.user.email} availability on {self.date}"
 
 
 class AvailabilityEvent(models.Model):
-    token = models.CharField(max_length=100, default=get_token)
+    token = models.CharField(max_length=100, default=get_token, db_index=True)
     creator = models.EmailField()
     availability = models.ForeignKey(
         Availability, on_delete=models.CASCADE, related_name="events"
@@ -320,6 +448,11 @@ class AvailabilityEvent(models.Model):
         default=list,
     )
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=["reminders"], name="availability_event_remind_gin"),
+        ]
+
     @property
     def starting_time(self) -> datetime.time:
         return self.start_time
@@ -334,7 +467,7 @@ class AvailabilityEvent(models.Model):
 
 
 class Section(models.Model):
-    token = models.CharField(max_length=100, default=get_token)
+    token = models.CharField(max_length=100, default=get_token, db_index=True)
     user = models.ForeignKey(
         Accounts, on_delete=models.CASCADE, related_name="sections"
     )
@@ -342,3 +475,179 @@ class Section(models.Model):
 
     def __str__(self):
         return f"{self.name} section of {self.user.email}"
+
+
+class DaySummary(models.Model):
+    section = models.ForeignKey(
+        Section, on_delete=models.CASCADE, related_name="day_summaries"
+    )
+    date = models.DateField()
+    event_count = models.PositiveIntegerField(default=0)
+    earliest_start = models.TimeField(null=True, blank=True)
+    latest_end = models.TimeField(null=True, blank=True)
+    has_all_day_event = models.BooleanField(default=False)
+    has_availability = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["section", "date"], name="unique_section_day_summary"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.section.name} summary on {self.date}"
+
+
+class ReminderSchedule(models.Model):
+    """
+    When one reminder of an event, accepted invitation or availability event
+    is due, as an absolute UTC time, for one occurrence date.
+
+    Rows are kept in step by `diary.reminders`, so the reminder task only has
+    to read the due, unsent rows.
+    """
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="reminder_schedule",
+        null=True,
+        blank=True,
+    )
+    invitation = models.ForeignKey(
+        EventInvitation,
+        on_delete=models.CASCADE,
+        related_name="reminder_schedule",
+        null=True,
+        blank=True,
+    )
+    availability_event = models.ForeignKey(
+        AvailabilityEvent,
+        on_delete=models.CASCADE,
+        related_name="reminder_schedule",
+        null=True,
+        blank=True,
+    )
+    reminder_type = models.CharField(max_length=20, choices=EventReminderType.choices)
+    occurrence_date = models.DateField()
+    fire_at = models.DateTimeField()
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Lets the reminder dispatcher pick up only the rows changed since it
+    # last looked.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(
+                    event__isnull=False,
+                    invitation__isnull=True,
+                    availability_event__isnull=True,
+                )
+                | models.Q(
+                    event__isnull=True,
+                    invitation__isnull=False,
+                    availability_event__isnull=True,
+                )
+                | models.Q(
+                    event__isnull=True,
+                    invitation__isnull=True,
+                    availability_event__isnull=False,
+                ),
+                name="reminder_schedule_single_target",
+            ),
+            models.UniqueConstraint(
+                fields=["event", "reminder_type", "occurrence_date"],
+                name="unique_event_reminder",
+            ),
+            models.UniqueConstraint(
+                fields=["invitation", "reminder_type", "occurrence_date"],
+                name="unique_invitation_reminder",
+            ),
+            models.UniqueConstraint(
+                fields=["availability_event", "reminder_type", "occurrence_date"],
+                name="unique_availability_event_reminder",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["fire_at"],
+                condition=models.Q(sent_at__isnull=True),
+                name="reminder_schedule_due",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.reminder_type} reminder due at {self.fire_at}"
+
+    @property
+    def target(self) -> typing.Union[Event, EventInvitation, AvailabilityEvent]:
+        return self.event or self.invitation or self.availability_event
+
+
+class SentReminder(models.Model):
+    """
+    Ledger of the reminders already sent, one row per object, reminder type
+    and occurrence date.
+
+    A reminder is claimed by inserting its row before it is sent, so the
+    unique constraints let only one run send it, however many overlap.
+    """
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="sent_reminders",
+        null=True,
+        blank=True,
+    )
+    invitation = models.ForeignKey(
+        EventInvitation,
+        on_delete=models.CASCADE,
+        related_name="sent_reminders",
+        null=True,
+        blank=True,
+    )
+    availability_event = models.ForeignKey(
+        AvailabilityEvent,
+        on_delete=models.CASCADE,
+        related_name="sent_reminders",
+        null=True,
+        blank=True,
+    )
+    reminder_type = models.CharField(max_length=20, choices=EventReminderType.choices)
+    occurrence_date = models.DateField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "reminder_type", "occurrence_date"],
+                name="unique_sent_event_reminder",
+            ),
+            models.UniqueConstraint(
+                fields=["invitation", "reminder_type", "occurrence_date"],
+                name="unique_sent_invitation_reminder",
+            ),
+            models.UniqueConstraint(
+                fields=["availability_event", "reminder_type", "occurrence_date"],
+                name="unique_sent_availability_event_reminder",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.reminder_type} reminder for {self.occurrence_date}"
+
+
+class ReminderWatermark(models.Model):
+    """
+    How far a reminder mode has processed, so the next run can catch up on
+    everything that became due since.
+    """
+
+    name = models.CharField(max_length=20, unique=True)
+    processed_until = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} reminders processed until {self.processed_until}"
@@ -0,0 +1,39 @@
+import datetime
+import typing
+
+from django.db.models import Q, QuerySet
+
+from .models import Event
+
+RECURRENCE_FIELDS = [
+    "token",
+    "title",
+    "dates",
+    "starting_time",
+    "ending_time",
+    "recurrence_frequency",
+    "recurrence_interval",
+    "recurrence_until",
+    "recurrence_count",
+    "recurrence_exceptions",
+]
+
+
+def recurring_events(start_date: datetime.date) -> QuerySet[Event]:
+    """
+    Recurring events whose series may still have dates from `start_date` on.
+
+    Recurring dates are never stored, so callers narrow this down further
+    (by section, owner, ...) and expand the rules with `expand_recurring_events`.
+    """
+    return Event.objects.filter(recurrence_frequency__isnull=False).filter(
+        Q(recurrence_until__isnull=True) | Q(recurrence_until__gte=start_date)
+    )
+
+
+def expand_recurring_events(
+    events: typing.Iterable[Event], start_date: datetime.date, end_date: datetime.date
+) -> typing.Iterator[typing.Tuple[Event, datetime.date]]:
+    for event in events:
+        for date in event.get_recurring_dates(start_date, end_date):
+            yield event, date
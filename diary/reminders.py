@@ -0,0 +1,391 @@
+import datetime
+import typing
+
+import pytz
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from account.models import Settings
+from utilities.time import get_timezone
+
+from .models import (
+    AvailabilityEvent,
+    Event,
+    EventInvitation,
+    EventReminderType,
+    ReminderSchedule,
+    ReminderWatermark,
+    SentReminder,
+)
+from .recurrence import recurring_events
+
+REMINDER_OFFSETS = {
+    EventReminderType.MINUTE_BEFORE: datetime.timedelta(minutes=1),
+    EventReminderType._15_MINUTES_BEFORE: datetime.timedelta(minutes=15),
+    EventReminderType._30_MINUTES_BEFORE: datetime.timedelta(minutes=30),
+    EventReminderType.HOUR_BEFORE: datetime.timedelta(hours=1),
+    EventReminderType._6_HOURS_BEFORE: datetime.timedelta(hours=6),
+    EventReminderType._12_HOURS_BEFORE: datetime.timedelta(hours=12),
+    EventReminderType.DAY_BEFORE: datetime.timedelta(hours=24),
+    EventReminderType.WEEK_BEFORE: datetime.timedelta(days=7),
+}
+
+# Fields deciding when an event's reminders are due.
+REMINDER_FIELDS = {
+    "dates",
+    "starting_time",
+    "reminders",
+    "recurrence_frequency",
+    "recurrence_interval",
+    "recurrence_until",
+    "recurrence_count",
+    "recurrence_exceptions",
+}
+
+# Recurring series are endless, so only their dates up to this many days
+# ahead are scheduled; `extend_recurring_reminders` moves the window daily.
+RECURRING_SCHEDULE_DAYS = 14
+
+# PostgreSQL channel notified whenever schedule rows are added or moved.
+REMINDER_SCHEDULE_CHANNEL = "reminder_schedule"
+
+Schedule = typing.Dict[typing.Tuple[str, datetime.date], datetime.datetime]
+
+
+class DueReminder(typing.NamedTuple):
+    target: typing.Union[Event, EventInvitation, AvailabilityEvent]
+    reminder_type: str
+    occurrence_date: datetime.date
+
+
+def get_user_timezone(user_id: int) -> pytz.BaseTzInfo:
+    time_zone = (
+        Settings.objects.filter(user_id=user_id)
+        .values_list("time_zone", flat=True)
+        .first()
+    )
+
+    return get_timezone(time_zone or settings.TIME_ZONE)
+
+
+def event_dates(event: Event, today: datetime.date) -> typing.Set[datetime.date]:
+    """
+    The event's explicit dates and its recurring dates within the window.
+    """
+    dates = set(event.dates) - set(event.recurrence_exceptions)
+    dates.update(
+        event.get_recurring_dates(
+            today - datetime.timedelta(days=1),
+            today + datetime.timedelta(days=RECURRING_SCHEDULE_DAYS),
+        )
+    )
+
+    return dates
+
+
+def build_schedule(
+    dates: typing.Iterable[datetime.date],
+    starting_time: typing.Optional[datetime.time],
+    reminder_types: typing.Iterable[str],
+    user_timezone: pytz.BaseTzInfo,
+) -> Schedule:
+    """
+    The UTC fire time of every reminder type for every date.
+
+    All-day events have no starting time and get no reminders.
+    """
+    if starting_time is None:
+        return {}
+
+    schedule = {}
+
+    for date in dates:
+        starts_at = user_timezone.localize(
+            datetime.datetime.combine(date, starting_time)
+        ).astimezone(pytz.utc)
+
+        for reminder_type in reminder_types:
+            if reminder_type in REMINDER_OFFSETS:
+                schedule[(reminder_type, date)] = (
+                    starts_at - REMINDER_OFFSETS[reminder_type]
+                )
+
+    return schedule
+
+
+def _sync_schedule(schedule: Schedule, now: datetime.datetime, **target: typing.Any):
+    """
+    Make the unsent rows of one target match a freshly built schedule.
+
+    Sent rows are never touched, so saving an object again does not send its
+    reminders twice, and no unsent row is kept for a fire time already past.
+    """
+    existing = {
+        (reminder_type, date): (pk, fire_at, sent_at)
+        for pk, reminder_type, date, fire_at, sent_at in ReminderSchedule.objects.filter(
+            **target
+        ).values_list(
+            "pk", "reminder_type", "occurrence_date", "fire_at", "sent_at"
+        )
+    }
+
+    stale = [
+        pk
+        for key, (pk, _, sent_at) in existing.items()
+        if sent_at is None and key not in schedule
+    ]
+    moved = []
+    created = []
+
+    for (reminder_type, date), fire_at in schedule.items():
+        if (reminder_type, date) in existing:
+            pk, current_fire_at, sent_at = existing[(reminder_type, date)]
+
+            if sent_at is not None or current_fire_at == fire_at:
+                continue
+
+            # Moved into the past: a late "in 15 minutes" would be wrong, so
+            # it is dropped like a new row would never be created.
+            if fire_at <= now:
+                stale.append(pk)
+            else:
+                moved.append(ReminderSchedule(pk=pk, fire_at=fire_at, updated_at=now))
+        elif fire_at > now:
+            created.append(
+                ReminderSchedule(
+                    reminder_type=reminder_type,
+                    occurrence_date=date,
+                    fire_at=fire_at,
+                    **target,
+                )
+            )
+
+    if stale:
+        ReminderSchedule.objects.filter(pk__in=stale).delete()
+
+    ReminderSchedule.objects.bulk_update(moved, ["fire_at", "updated_at"])
+    ReminderSchedule.objects.bulk_create(created)
+
+    if moved or created:
+        transaction.on_commit(notify_reminder_schedule)
+
+
+def notify_reminder_schedule():
+    """
+    Wake the reminder dispatcher, which listens on this channel.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f"NOTIFY {REMINDER_SCHEDULE_CHANNEL}")
+
+
+def schedule_event_reminders(
+    event: Event,
+    now: typing.Optional[datetime.datetime] = None,
+    user_timezone: typing.Optional[pytz.BaseTzInfo] = None,
+):
+    """
+    Reschedule an event's own reminders and those of its accepted invitations.
+
+    Event times are kept in the owner's time zone, so the invitations' fire
+    times are computed in it too.
+    """
+    now = now or datetime.datetime.now(tz=pytz.utc)
+    user_timezone = user_timezone or get_user_timezone(event.owner_id)
+    dates = event_dates(event, now.date())
+
+    _sync_schedule(
+        build_schedule(dates, event.starting_time, event.reminders, user_timezone),
+        now,
+        event=event,
+    )
+
+    for invitation in event.invitations.all():
+        _sync_schedule(
+            (
+                build_schedule(
+                    dates, event.starting_time, invitation.reminders, user_timezone
+                )
+                if invitation.accepted
+                else {}
+            ),
+            now,
+            invitation=invitation,
+        )
+
+
+def schedule_invitation_reminders(
+    invitation: EventInvitation, now: typing.Optional[datetime.datetime] = None
+):
+    now = now or datetime.datetime.now(tz=pytz.utc)
+    event = invitation.event
+    schedule = {}
+
+    if invitation.accepted:
+        schedule = build_schedule(
+            event_dates(event, now.date()),
+            event.starting_time,
+            invitation.reminders,
+            get_user_timezone(event.owner_id),
+        )
+
+    _sync_schedule(schedule, now, invitation=invitation)
+
+
+def schedule_availability_event_reminders(
+    availability_event: AvailabilityEvent,
+    now: typing.Optional[datetime.datetime] = None,
+    user_timezone: typing.Optional[pytz.BaseTzInfo] = None,
+):
+    availability = availability_event.availability
+
+    _sync_schedule(
+        build_schedule(
+            [availability.date],
+            availability_event.start_time,
+            availability_event.reminders,
+            user_timezone or get_user_timezone(availability.user_id),
+        ),
+        now or datetime.datetime.now(tz=pytz.utc),
+        availability_event=availability_event,
+    )
+
+
+def schedule_user_reminders(
+    user_id: int, now: typing.Optional[datetime.datetime] = None
+):
+    """
+    Reschedule everything timed in a user's time zone, after it changed.
+    """
+    now = now or datetime.datetime.now(tz=pytz.utc)
+    user_timezone = get_user_timezone(user_id)
+
+    for event in Event.objects.filter(owner_id=user_id).prefetch_related("invitations"):
+        schedule_event_reminders(event, now, user_timezone)
+
+    for availability_event in AvailabilityEvent.objects.filter(
+        availability__user_id=user_id
+    ).select_related("availability"):
+        schedule_availability_event_reminders(availability_event, now, user_timezone)
+
+
+def extend_recurring_reminders(now: typing.Optional[datetime.datetime] = None):
+    """
+    Schedule the recurring dates that entered the window since the last run.
+    """
+    now = now or datetime.datetime.now(tz=pytz.utc)
+
+    for event in (
+        recurring_events(now.date())
+        .filter(Q(reminders__len__gt=0) | Q(invitations__reminders__len__gt=0))
+        .distinct()
+        .prefetch_related("invitations")
+    ):
+        schedule_event_reminders(event, now)
+
+
+def rebuild_reminder_schedule(now: typing.Optional[datetime.datetime] = None) -> int:
+    """
+    Schedule the reminders of every object that has any, returning how many
+    objects were processed.
+    """
+    now = now or datetime.datetime.now(tz=pytz.utc)
+    count = 0
+
+    for event in (
+        Event.objects.filter(
+            Q(reminders__len__gt=0) | Q(invitations__reminders__len__gt=0)
+        )
+        .distinct()
+        .prefetch_related("invitations")
+    ):
+        schedule_event_reminders(event, now)
+        count += 1
+
+    for availability_event in AvailabilityEvent.objects.filter(
+        reminders__len__gt=0
+    ).select_related("availability"):
+        schedule_availability_event_reminders(availability_event, now)
+        count += 1
+
+    return count
+
+
+def _target_fields(
+    target: typing.Union[Event, EventInvitation, AvailabilityEvent],
+) -> typing.Dict[str, typing.Any]:
+    if isinstance(target, Event):
+        return {"event": target}
+
+    if isinstance(target, EventInvitation):
+        return {"invitation": target}
+
+    return {"availability_event": target}
+
+
+def claim_reminders(
+    reminders: typing.Iterable[DueReminder],
+) -> typing.List[DueReminder]:
+    """
+    Record reminders in the sent ledger, returning those this call claimed.
+
+    A reminder already in the ledger, sent by an earlier or overlapping run,
+    is left out, so only one run ever sends it.
+    """
+    claimed = []
+
+    for reminder in reminders:
+        try:
+            with transaction.atomic():
+                SentReminder.objects.create(
+                    reminder_type=reminder.reminder_type,
+                    occurrence_date=reminder.occurrence_date,
+                    **_target_fields(reminder.target),
+                )
+        except IntegrityError:
+            continue
+
+        claimed.append(reminder)
+
+    return claimed
+
+
+def get_catch_up_start(name: str, now: datetime.datetime) -> datetime.datetime:
+    """
+    Where a run of a reminder mode should start: the last processed time, but
+    no further back than REMINDER_CATCH_UP_MINUTES.
+    """
+    earliest = now - datetime.timedelta(minutes=settings.REMINDER_CATCH_UP_MINUTES)
+    processed_until = (
+        ReminderWatermark.objects.filter(name=name)
+        .values_list("processed_until", flat=True)
+        .first()
+    )
+
+    if processed_until is None:
+        return now - datetime.timedelta(minutes=1)
+
+    return max(processed_until, earliest)
+
+
+def advance_watermark(name: str, processed_until: datetime.datetime):
+    # Never move back, should an older run finish after a newer one.
+    updated = ReminderWatermark.objects.filter(name=name).update(
+        processed_until=Greatest("processed_until", processed_until)
+    )
+
+    if not updated:
+        ReminderWatermark.objects.get_or_create(
+            name=name, defaults={"processed_until": processed_until}
+        )
+
+
+def prune_sent_reminders(today: datetime.date, days: int = 30):
+    """
+    Drop ledger rows of occurrences long past, which can no longer be due.
+    """
+    SentReminder.objects.filter(
+        occurrence_date__lt=today - datetime.timedelta(days=days)
+    ).delete()
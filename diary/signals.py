@@ -1,9 +1,194 @@
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import Event
+from account.models import Settings
+from utilities.time import time_range_mask
+
+from .caching import schedule_calendar_invalidation
+from .models import (
+    Availability,
+    AvailabilityEvent,
+    AvailabilityTimeSlot,
+    Event,
+    EventInvitation,
+)
+from .reminders import (
+    REMINDER_FIELDS,
+    schedule_availability_event_reminders,
+    schedule_event_reminders,
+    schedule_invitation_reminders,
+    schedule_user_reminders,
+)
+from .summaries import schedule_day_summaries_refresh
 
 
 @receiver(post_save, sender=Event)
-def event_post_save(sender, instance, **kwargs):
-    pass
+@receiver(post_delete, sender=Event)
+def event_changed(sender, instance, **kwargs):
+    schedule_calendar_invalidation(instance.owner_id)
+
+    if kwargs.get("signal") is post_save:
+        for user_id in instance.invitations.filter(accepted=True).values_list(
+            "user_id", flat=True
+        ):
+            schedule_calendar_invalidation(user_id)
+
+
+@receiver(post_save, sender=EventInvitation)
+@receiver(post_delete, sender=EventInvitation)
+def event_invitation_changed(sender, instance, **kwargs):
+    schedule_calendar_invalidation(instance.user_id)
+
+
+@receiver(post_save, sender=Availability)
+@receiver(post_delete, sender=Availability)
+def availability_changed(sender, instance, **kwargs):
+    schedule_calendar_invalidation(instance.user_id)
+
+
+@receiver(post_save, sender=AvailabilityTimeSlot)
+@receiver(post_delete, sender=AvailabilityTimeSlot)
+@receiver(post_save, sender=AvailabilityEvent)
+@receiver(post_delete, sender=AvailabilityEvent)
+def availability_child_changed(sender, instance, **kwargs):
+    schedule_calendar_invalidation(
+        Availability.objects.filter(pk=instance.availability_id)
+        .values_list("user_id", flat=True)
+        .first()
+    )
+
+
+@receiver(pre_save, sender=Event)
+def event_pre_save(sender, instance, **kwargs):
+    instance._previous_state = (
+        Event.objects.filter(pk=instance.pk).values("section_id", "dates").first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def event_summaries(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_state", None)
+    dates = set(instance.dates)
+
+    if previous is not None:
+        dates.update(previous["dates"])
+
+        if previous["section_id"] != instance.section_id:
+            schedule_day_summaries_refresh(previous["section_id"], dates)
+
+    schedule_day_summaries_refresh(instance.section_id, dates)
+
+    if kwargs.get("signal") is post_save:
+        for section_id in instance.invitations.filter(accepted=True).values_list(
+            "section_id", flat=True
+        ):
+            schedule_day_summaries_refresh(section_id, dates)
+
+
+@receiver(pre_save, sender=EventInvitation)
+def event_invitation_pre_save(sender, instance, **kwargs):
+    instance._previous_section_id = (
+        EventInvitation.objects.filter(pk=instance.pk)
+        .values_list("section_id", flat=True)
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=EventInvitation)
+@receiver(post_delete, sender=EventInvitation)
+def event_invitation_summaries(sender, instance, **kwargs):
+    dates = (
+        Event.objects.filter(pk=instance.event_id)
+        .values_list("dates", flat=True)
+        .first()
+    ) or []
+    previous_section_id = getattr(instance, "_previous_section_id", None)
+
+    if previous_section_id != instance.section_id:
+        schedule_day_summaries_refresh(previous_section_id, dates)
+
+    schedule_day_summaries_refresh(instance.section_id, dates)
+
+
+@receiver(post_save, sender=Availability)
+@receiver(post_delete, sender=Availability)
+def availability_summaries(sender, instance, **kwargs):
+    schedule_day_summaries_refresh(instance.section_id, [instance.date])
+
+
+@receiver(post_save, sender=AvailabilityTimeSlot)
+@receiver(post_delete, sender=AvailabilityTimeSlot)
+@receiver(post_save, sender=AvailabilityEvent)
+@receiver(post_delete, sender=AvailabilityEvent)
+def availability_child_summaries(sender, instance, **kwargs):
+    availability = (
+        Availability.objects.filter(pk=instance.availability_id)
+        .values("section_id", "date")
+        .first()
+    )
+
+    if availability is not None:
+        schedule_day_summaries_refresh(
+            availability["section_id"], [availability["date"]]
+        )
+
+
+@receiver(post_save, sender=AvailabilityTimeSlot)
+@receiver(post_delete, sender=AvailabilityTimeSlot)
+def availability_time_slot_mask(sender, instance, **kwargs):
+    bit = time_range_mask(instance.start_time, instance.end_time)
+
+    if kwargs.get("signal") is post_save:
+        slot_mask = F("slot_mask").bitor(bit)
+    else:
+        slot_mask = F("slot_mask").bitand(~bit)
+
+    Availability.objects.filter(pk=instance.availability_id).update(slot_mask=slot_mask)
+
+    # Keep an availability already loaded alongside the slot in step too.
+    if AvailabilityTimeSlot.availability.is_cached(instance):
+        availability = instance.availability
+
+        if kwargs.get("signal") is post_save:
+            availability.slot_mask |= bit
+        else:
+            availability.slot_mask &= ~bit
+
+
+@receiver(post_save, sender=Event)
+def event_reminders(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or REMINDER_FIELDS.intersection(update_fields):
+        schedule_event_reminders(instance)
+
+
+@receiver(post_save, sender=EventInvitation)
+def event_invitation_reminders(sender, instance, **kwargs):
+    schedule_invitation_reminders(instance)
+
+
+@receiver(post_save, sender=AvailabilityEvent)
+def availability_event_reminders(sender, instance, **kwargs):
+    schedule_availability_event_reminders(instance)
+
+
+@receiver(pre_save, sender=Settings)
+def settings_pre_save(sender, instance, **kwargs):
+    instance._previous_time_zone = (
+        Settings.objects.filter(pk=instance.pk)
+        .values_list("time_zone", flat=True)
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Settings)
+def settings_reminders(sender, instance, created, **kwargs):
+    if not created and instance._previous_time_zone != instance.time_zone:
+        schedule_user_reminders(instance.user_id)
@@ -0,0 +1,148 @@
+import datetime
+import functools
+import typing
+
+from django.db import transaction
+
+from .models import (
+    Availability,
+    AvailabilityEvent,
+    DaySummary,
+    EventOccurrence,
+    Section,
+)
+
+SUMMARY_FIELDS = [
+    "event_count",
+    "earliest_start",
+    "latest_end",
+    "has_all_day_event",
+    "has_availability",
+]
+
+
+def _aggregate_days(
+    section_id: int, dates: typing.Optional[typing.Set[datetime.date]] = None
+) -> typing.Dict[datetime.date, DaySummary]:
+    """
+    Compute fresh summaries of a section's days from the source tables.
+
+    Only the given dates are aggregated, or every day of the section when
+    `dates` is None. Days without events or availability are left out.
+    """
+    occurrences = EventOccurrence.objects.filter(section_id=section_id)
+    invitations = EventOccurrence.objects.filter(
+        event__invitations__section_id=section_id,
+        event__invitations__accepted=True,
+    )
+    availability_events = AvailabilityEvent.objects.filter(
+        availability__section_id=section_id
+    )
+    availabilities = Availability.objects.filter(section_id=section_id)
+
+    if dates is not None:
+        occurrences = occurrences.filter(date__in=dates)
+        invitations = invitations.filter(date__in=dates)
+        availability_events = availability_events.filter(availability__date__in=dates)
+        availabilities = availabilities.filter(date__in=dates)
+
+    summaries = {}
+
+    def summary_for(date: datetime.date) -> DaySummary:
+        if date not in summaries:
+            summaries[date] = DaySummary(section_id=section_id, date=date)
+
+        return summaries[date]
+
+    def add(
+        date: datetime.date,
+        starting_time: typing.Optional[datetime.time],
+        ending_time: typing.Optional[datetime.time],
+    ) -> None:
+        if dates is not None and date not in dates:
+            return
+
+        summary = summary_for(date)
+        summary.event_count += 1
+
+        if starting_time is None:
+            summary.has_all_day_event = True
+            return
+
+        if summary.earliest_start is None or starting_time < summary.earliest_start:
+            summary.earliest_start = starting_time
+
+        if summary.latest_end is None or ending_time > summary.latest_end:
+            summary.latest_end = ending_time
+
+    for queryset in (occurrences, invitations):
+        for date, starting_time, ending_time in queryset.values_list(
+            "date", "event__starting_time", "event__ending_time"
+        ):
+            add(date, starting_time, ending_time)
+
+    for date, start_time, end_time in availability_events.values_list(
+        "availability__date", "start_time", "end_time"
+    ):
+        add(date, start_time, end_time)
+
+    for date in availabilities.values_list("date", flat=True):
+        summary_for(date).has_availability = True
+
+    return summaries
+
+
+def refresh_day_summaries(
+    section_id: typing.Optional[int], dates: typing.Iterable[datetime.date]
+) -> None:
+    """
+    Recompute the summaries of the given days of a section.
+
+    Called whenever something shown on those days changes, so the table only
+    ever rewrites the handful of rows that were actually touched.
+    """
+    dates = set(dates)
+
+    if section_id is None or not dates:
+        return
+
+    if not Section.objects.filter(pk=section_id).exists():
+        return
+
+    summaries = _aggregate_days(section_id, dates)
+
+    with transaction.atomic():
+        DaySummary.objects.filter(section_id=section_id, date__in=dates).exclude(
+            date__in=list(summaries)
+        ).delete()
+
+        DaySummary.objects.bulk_create(
+            summaries.values(),
+            update_conflicts=True,
+            unique_fields=["section", "date"],
+            update_fields=SUMMARY_FIELDS,
+        )
+
+
+def schedule_day_summaries_refresh(
+    section_id: typing.Optional[int], dates: typing.Iterable[datetime.date]
+) -> None:
+    """
+    Refresh the summaries once the current transaction commits.
+
+    Deferring keeps cascades (e.g. deleting a section) from aggregating rows
+    that are about to disappear, and lets the refresh see the final state.
+    """
+    transaction.on_commit(
+        functools.partial(refresh_day_summaries, section_id, frozenset(dates))
+    )
+
+
+def rebuild_day_summaries(section: Section) -> int:
+    summaries = _aggregate_days(section.pk)
+
+    with transaction.atomic():
+        DaySummary.objects.filter(section=section).delete()
+        DaySummary.objects.bulk_create(summaries.values())
+
+    return len(summaries)
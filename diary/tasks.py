@@ -1,17 +1,42 @@
+import collections
 import datetime
 import typing
 
 import pytz
+from celery.schedules import crontab
+from django.conf import settings
+from django.db import models
 
 from _config.celery import app
-from diary.models import AvailabilityEvent, Event, EventInvitation, EventReminderType
-from utilities.tasks import send_user_notification
-from utilities.time import timezone_choices
+from account.models import Settings
+from diary.models import (
+    AvailabilityEvent,
+    Event,
+    EventInvitation,
+    EventReminderType,
+    ReminderSchedule,
+)
+from diary.recurrence import recurring_events
+from diary.reminders import (
+    REMINDER_OFFSETS,
+    DueReminder,
+    advance_watermark,
+    claim_reminders,
+    extend_recurring_reminders,
+    get_catch_up_start,
+    prune_sent_reminders,
+)
+from utilities.tasks import enqueue_notifications, notification
+from utilities.time import get_timezone, is_timezone_valid
 
 
 @app.on_after_finalize.connect
 def setup_periodic_tasks(sender, **kwargs):
-    sender.add_periodic_task(60.0, check_reminders.s())
+    # The dispatch_reminders command sends them itself when it is running.
+    if not settings.REMINDER_DISPATCHER:
+        sender.add_periodic_task(60.0, check_reminders.s())
+
+    sender.add_periodic_task(crontab(hour=0, minute=5), extend_reminder_schedule.s())
 
 
 type_to_relative_time = {
@@ -29,135 +54,228 @@ type_to_relative_time = {
 def append_for_datetime(
     dt: datetime.datetime,
     typ: EventReminderType,
-    reminders: typing.List[
-        typing.Tuple[
-            typing.Union[Event, EventInvitation, AvailabilityEvent],
-            str,
-        ],
-    ],
-    timezone: str,
+    reminders: typing.List[DueReminder],
+    timezones: typing.List[str],
 ):
     for event in Event.objects.filter(
-        dates__contains=[dt.date()],
+        occurrences__date=dt.date(),
+        occurrences__start_time=dt.time().replace(second=0, microsecond=0),
+        reminders__contains=[typ],
+        owner__settings__time_zone__in=timezones,
+    ):
+        reminders.append(DueReminder(event, typ, dt.date()))
+
+    for invitation in EventInvitation.objects.filter(
+        event__occurrences__date=dt.date(),
+        event__occurrences__start_time=dt.time().replace(second=0, microsecond=0),
+        event__owner__settings__time_zone__in=timezones,
+        reminders__contains=[typ],
+        accepted=True,
+    ):
+        reminders.append(DueReminder(invitation, typ, dt.date()))
+
+    # Recurring dates are not stored, so series are expanded for this day only.
+    for event in recurring_events(dt.date()).filter(
         starting_time=dt.time().replace(second=0, microsecond=0),
         reminders__contains=[typ],
-        owner__settings__time_zone=timezone,
+        owner__settings__time_zone__in=timezones,
     ):
-        reminders.append((event, f"{type_to_relative_time[typ]}"))
+        if event.get_recurring_dates(dt.date(), dt.date()):
+            reminders.append(DueReminder(event, typ, dt.date()))
 
     for invitation in EventInvitation.objects.filter(
-        event__dates__contains=[dt.date()],
+        event__in=recurring_events(dt.date()),
         event__starting_time=dt.time().replace(second=0, microsecond=0),
-        event__owner__settings__time_zone=timezone,
+        event__owner__settings__time_zone__in=timezones,
         reminders__contains=[typ],
         accepted=True,
-    ):
-        reminders.append((invitation, f"{type_to_relative_time[typ]}"))
+    ).select_related("event"):
+        if invitation.event.get_recurring_dates(dt.date(), dt.date()):
+            reminders.append(DueReminder(invitation, typ, dt.date()))
 
     for availability_event in AvailabilityEvent.objects.filter(
         availability__date=dt.date(),
-        availability__user__settings__time_zone=timezone,
+        availability__user__settings__time_zone__in=timezones,
         start_time=dt.time().replace(second=0, microsecond=0),
         reminders__contains=[typ],
-    ):
-        reminders.append((availability_event, f"{type_to_relative_time[typ]}"))
+    ).select_related("availability"):
+        reminders.append(
+            DueReminder(availability_event, typ, availability_event.availability.date)
+        )
 
 
-@app.task
-def check_reminders():
-    for timezone in timezone_choices:
-        now = datetime.datetime.now(tz=pytz.timezone(timezone[0]))
-
-        time_in_one_minute = now + datetime.timedelta(minutes=1)
-        time_in_15_minutes = now + datetime.timedelta(minutes=15)
-        time_in_30_minutes = now + datetime.timedelta(minutes=30)
-        time_in_1_hour = now + datetime.timedelta(hours=1)
-        time_in_6_hours = now + datetime.timedelta(hours=6)
-        time_in_12_hours = now + datetime.timedelta(hours=12)
-        time_in_24_hours = now + datetime.timedelta(hours=24)
-        time_in_7_days = now + datetime.timedelta(days=7)
-
-        reminders: typing.List[
-            typing.Tuple[
-                typing.Union[Event, EventInvitation, AvailabilityEvent],
-                str,
-            ],
-        ] = []
-
-        append_for_datetime(
-            time_in_one_minute, EventReminderType.MINUTE_BEFORE, reminders, timezone[0]
-        )
-        append_for_datetime(
-            time_in_15_minutes,
-            EventReminderType._15_MINUTES_BEFORE,
-            reminders,
-            timezone,
-        )
-        append_for_datetime(
-            time_in_30_minutes,
-            EventReminderType._30_MINUTES_BEFORE,
-            reminders,
-            timezone,
+def reminder_message(
+    obj: typing.Union[Event, EventInvitation, AvailabilityEvent], relative_time: str
+) -> typing.Tuple[str, typing.Dict[str, typing.Any]]:
+    """
+    The recipient and email context of one reminder.
+    """
+    context = {
+        "upcoming_time": relative_time,
+    }
+
+    if isinstance(obj, Event):
+        email = obj.owner.email
+        context.update(
+            {
+                "event_title": obj.title,
+                "event_starting_time": obj.starting_time,
+                "event_ending_time": obj.ending_time,
+                "event_dates": obj.stringify_dates(", "),
+            }
         )
-        append_for_datetime(
-            time_in_1_hour, EventReminderType.HOUR_BEFORE, reminders, timezone[0]
+    elif isinstance(obj, EventInvitation):
+        email = obj.user.email
+        context.update(
+            {
+                "event_title": obj.event.title,
+                "event_starting_time": obj.event.starting_time,
+                "event_ending_time": obj.event.ending_time,
+                "event_dates": obj.event.stringify_dates(", "),
+            }
         )
-        append_for_datetime(
-            time_in_6_hours, EventReminderType._6_HOURS_BEFORE, reminders, timezone[0]
+    else:
+        email = obj.availability.user.email
+        context.update(
+            {
+                "event_title": obj.title,
+                "event_description": obj.description,
+                "event_starting_time": obj.start_time,
+                "event_ending_time": obj.end_time,
+                "event_dates": obj.availability.date.strftime("%Y-%m-%d"),
+            }
         )
-        append_for_datetime(
-            time_in_12_hours, EventReminderType._12_HOURS_BEFORE, reminders, timezone[0]
+
+    return email, context
+
+
+def send_reminders(reminders: typing.List[DueReminder]):
+    """
+    Send the reminders no other run has claimed in the sent ledger.
+    """
+    messages = []
+
+    for reminder in claim_reminders(reminders):
+        email, context = reminder_message(
+            reminder.target, type_to_relative_time[reminder.reminder_type]
         )
-        append_for_datetime(
-            time_in_24_hours, EventReminderType.DAY_BEFORE, reminders, timezone[0]
+        messages.append(
+            notification(
+                context, "Upcoming event", "diary/email/upcoming_event.html", [email]
+            )
         )
-        append_for_datetime(
-            time_in_7_days, EventReminderType.WEEK_BEFORE, reminders, timezone[0]
+
+    enqueue_notifications(messages)
+
+
+def send_schedule_rows(rows: models.QuerySet, now: datetime.datetime) -> int:
+    """
+    Send the unsent reminders among some schedule rows and mark them sent,
+    returning how many rows there were.
+    """
+    due = list(
+        rows.filter(sent_at__isnull=True).select_related(
+            "event__owner",
+            "invitation__user",
+            "invitation__event",
+            "availability_event__availability__user",
         )
+    )
 
-        for reminder in reminders:
-            obj, relative_time = reminder
-            email = None
+    send_reminders(
+        [
+            DueReminder(
+                reminder.target, reminder.reminder_type, reminder.occurrence_date
+            )
+            for reminder in due
+        ]
+    )
+    ReminderSchedule.objects.filter(pk__in=[reminder.pk for reminder in due]).update(
+        sent_at=now
+    )
 
-            context = {
-                "upcoming_time": relative_time,
-            }
+    return len(due)
 
-            if isinstance(obj, Event):
-                email = obj.user.email
-                context.update(
-                    {
-                        "event_title": obj.title,
-                        "event_starting_time": obj.starting_time,
-                        "event_ending_time": obj.ending_time,
-                        "event_dates": obj.stringify_dates(", "),
-                    }
-                )
-            elif isinstance(obj, EventInvitation):
-                email = obj.user.email
-                context.update(
-                    {
-                        "event_title": obj.event.title,
-                        "event_starting_time": obj.event.starting_time,
-                        "event_ending_time": obj.event.ending_time,
-                        "event_dates": obj.event.stringify_dates(", "),
-                    }
-                )
-            elif isinstance(obj, AvailabilityEvent):
-                email = obj.availability.user.email
-                context.update(
-                    {
-                        "event_title": obj.title,
-                        "event_description": obj.description,
-                        "event_starting_time": obj.start_time,
-                        "event_ending_time": obj.end_time,
-                        "event_dates": obj.availability.date.strftime("%Y-%m-%d"),
-                    }
+
+def send_scheduled_reminders(since: datetime.datetime, now: datetime.datetime):
+    """
+    Send the reminders of the schedule table that became due since the last
+    run and are not sent yet.
+    """
+    send_schedule_rows(
+        ReminderSchedule.objects.filter(fire_at__gt=since, fire_at__lte=now), now
+    )
+
+
+def active_timezone_buckets(
+    now: datetime.datetime,
+) -> typing.List[typing.List[str]]:
+    """
+    The time zones users have set, grouped by their current UTC offset and
+    DST state. Zones of a group share their local time, so one set of queries
+    covers all of them.
+    """
+    buckets = collections.defaultdict(list)
+
+    for time_zone in Settings.objects.values_list("time_zone", flat=True).distinct():
+        if not is_timezone_valid(time_zone):
+            continue
+
+        local_now = now.astimezone(get_timezone(time_zone))
+        buckets[(local_now.utcoffset(), bool(local_now.dst()))].append(time_zone)
+
+    return list(buckets.values())
+
+
+def sweep_timezones(since: datetime.datetime, now: datetime.datetime):
+    """
+    Match every reminder type against each minute since the last run, for
+    every time zone in use, one offset bucket at a time.
+
+    Used when REMINDER_SCHEDULE is off. Its cost grows with the number of
+    distinct offsets users are in, not with the size of the tz database.
+    """
+    minute = since.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+    reminders: typing.List[DueReminder] = []
+
+    while minute <= now:
+        for timezones in active_timezone_buckets(minute):
+            local_minute = minute.astimezone(get_timezone(timezones[0]))
+
+            for reminder_type, offset in REMINDER_OFFSETS.items():
+                append_for_datetime(
+                    local_minute + offset, reminder_type, reminders, timezones
                 )
 
-            send_user_notification.delay(
-                context,
-                "Upcoming event",
-                "diary/email/upcoming_event.html",
-                [email],
-            )
+        minute += datetime.timedelta(minutes=1)
+
+    send_reminders(reminders)
+
+
+@app.task
+def check_reminders():
+    """
+    Send everything that became due since the last successful run.
+
+    Runs that are late, skipped or overlapping neither lose nor repeat
+    reminders: the watermark only moves once a run is done, and the sent
+    ledger lets each reminder through once.
+    """
+    now = datetime.datetime.now(tz=pytz.utc)
+    mode = "schedule" if settings.REMINDER_SCHEDULE else "sweep"
+    since = get_catch_up_start(mode, now)
+
+    if settings.REMINDER_SCHEDULE:
+        send_scheduled_reminders(since, now)
+    else:
+        sweep_timezones(since, now)
+
+    advance_watermark(mode, now)
+
+
+@app.task
+def extend_reminder_schedule():
+    now = datetime.datetime.now(tz=pytz.utc)
+
+    extend_recurring_reminders(now)
+    prune_sent_reminders(now.date())
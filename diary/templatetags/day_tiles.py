@@ -0,0 +1,125 @@
+import typing
+
+from django import template
+from django.conf import settings
+from django.utils.safestring import mark_safe
+
+from diary.tiles import DayTileRenderer
+
+register = template.Library()
+
+TILE_FLAGS = [
+    "expanded",
+    "density",
+    "exclude_sensitive_data",
+    "exclude_events",
+    "exclude_availability",
+    "overlay",
+]
+
+
+@register.simple_tag
+def day_tile_cache_timeout() -> int:
+    return settings.DAY_TILE_CACHE_TIMEOUT
+
+
+@register.simple_tag(takes_context=True)
+def day_tile_fingerprint(context: template.Context, day: typing.Dict) -> str:
+    """
+    Describe everything a day tile renders, for use as a fragment cache key.
+
+    Two tiles with the same fingerprint render the same HTML, so the key
+    changes by itself whenever the day's events, availability or position
+    relative to today change. Today's tile also depends on the current
+    minute, as its events turn from upcoming to ongoing to finished.
+
+    Example:
+
+    ```
+    {% day_tile_fingerprint day as fingerprint %}
+    ```
+    """
+    current_date = day["datetime"].date()
+    today = context.get("today")
+
+    if current_date == today:
+        relation = f"today {str(context.get('now'))[:16]}"
+    elif today is not None and current_date < today:
+        relation = "past"
+    else:
+        relation = "future"
+
+    availability = day.get("availability")
+    events = day.get("events") or []
+
+    return repr(
+        (
+            current_date,
+            relation,
+            context.get("display_mode"),
+            context.get("start_date"),
+            day.get("is_weekend"),
+            day.get("is_previous_month"),
+            day.get("is_selected"),
+            day.get("event_count"),
+            day.get("has_past_event"),
+            day.get("has_ongoing_event"),
+            day.get("has_future_event"),
+            [
+                (
+                    event.token,
+                    event.title,
+                    event.starting_time,
+                    event.ending_time,
+                    getattr(event, "is_availability_event", False),
+                    getattr(event, "section_token", None),
+                )
+                for event in events
+            ],
+            availability
+            and (
+                availability.token,
+                availability.jsonified_time_slots,
+                getattr(availability, "section_token", None),
+            ),
+        )
+    )
+
+
+@register.simple_tag(takes_context=True)
+def day_tiles(context: template.Context, days: typing.Iterable[typing.Dict], **flags):
+    """
+    Render the tiles of a list of days, e.g. a month grid.
+
+    Takes the same flags as 'diary/day_tile.html', falling back to the ones
+    set in the context. With CALENDAR_COMPILED_TILES the tiles are rendered
+    in Python, otherwise the template is included once per day.
+
+    Example:
+
+    ```
+    {% day_tiles month.days expanded=False exclude_availability=True %}
+    ```
+    """
+    flags = {**{flag: context.get(flag, False) for flag in TILE_FLAGS}, **flags}
+
+    if settings.CALENDAR_COMPILED_TILES:
+        renderer = DayTileRenderer(
+            today=context.get("today"),
+            now=context.get("now"),
+            display_mode=context.get("display_mode"),
+            start_date=context.get("start_date"),
+            **flags,
+        )
+
+        return mark_safe(renderer.render(days))
+
+    tile_template = context.template.engine.get_template("diary/day_tile.html")
+    tiles = []
+
+    with context.push(**flags):
+        for day in days:
+            with context.push(day=day):
+                tiles.append(tile_template.render(context))
+
+    return mark_safe("".join(tiles))
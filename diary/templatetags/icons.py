@@ -1,12 +1,146 @@
+import functools
+import json
 import pathlib
+import typing
 import xml.etree.ElementTree as ET
 
 from django import template
+from django.conf import settings
+from django.templatetags.static import static
 from django.utils.safestring import mark_safe
 
 register = template.Library()
 
 ICON_DIR = pathlib.Path("static/images/icons/")
+SPRITE_DIR = pathlib.Path("static/images/sprites/")
+SPRITE_MANIFEST = SPRITE_DIR / "icons.json"
+
+ET.register_namespace("", "http://www.w3.org/2000/svg")
+
+
+class IconTemplate(typing.NamedTuple):
+    """
+    An icon serialised once, split around the attributes of its root element.
+    """
+
+    head: str
+    attributes: typing.Dict[str, str]
+    body: str
+
+    def render(self, attributes: typing.Dict[str, str]) -> str:
+        merged = {**self.attributes, **attributes}
+
+        return (
+            self.head
+            + "".join(
+                f' {key}="{_escape_attribute(value)}"' for key, value in merged.items()
+            )
+            + self.body
+        )
+
+
+def _escape_attribute(value: str) -> str:
+    # Same escaping as ElementTree's HTML serialiser.
+    return value.replace("&", "&amp;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+@functools.lru_cache(maxsize=None)
+def _load_icon(icon_name: str, mtime: int) -> IconTemplate:
+    root = ET.parse(ICON_DIR / f"{icon_name}.svg").getroot()
+    attributes = dict(root.attrib)
+
+    root.attrib.clear()
+    svg = ET.tostring(root, encoding="unicode", method="html")
+    head, body = svg.split(">", 1)
+
+    return IconTemplate(head, attributes, ">" + body)
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_icon(
+    icon_name: str, mtime: int, attributes: typing.Tuple[typing.Tuple[str, str], ...]
+) -> str:
+    return _load_icon(icon_name, mtime).render(dict(attributes))
+
+
+def sprite_symbol_id(icon_name: str) -> str:
+    return "icon-" + icon_name.replace(" ", "-")
+
+
+@functools.lru_cache(maxsize=None)
+def _load_sprite_manifest(mtime: int) -> typing.Dict[str, typing.Any]:
+    manifest = json.loads(SPRITE_MANIFEST.read_text())
+
+    return {
+        "url": static(manifest["file"]),
+        "symbols": manifest["symbols"],
+    }
+
+
+def get_sprite_manifest() -> typing.Optional[typing.Dict[str, typing.Any]]:
+    """
+    The sprite built by the build_icon_sprite command, if there is one.
+    """
+    try:
+        mtime = SPRITE_MANIFEST.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    return _load_sprite_manifest(mtime)
+
+
+def icons_version(*icon_names: str) -> typing.Tuple[typing.Optional[int], ...]:
+    """
+    Changes whenever one of the icons, or the sprite referencing them, does,
+    for caches of markup built with the icon tag.
+    """
+    sprite_mtime = None
+
+    if settings.ICON_SPRITE:
+        try:
+            sprite_mtime = SPRITE_MANIFEST.stat().st_mtime_ns
+        except FileNotFoundError:
+            pass
+
+    return (
+        sprite_mtime,
+        *(
+            (ICON_DIR / f"{icon_name}.svg").stat().st_mtime_ns
+            for icon_name in icon_names
+        ),
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_sprite_icon(
+    icon_name: str,
+    mtime: int,
+    attributes: typing.Tuple[typing.Tuple[str, str], ...],
+    href: str,
+) -> str:
+    icon_template = _load_icon(icon_name, mtime)
+    merged = {**icon_template.attributes, **dict(attributes)}
+
+    return (
+        icon_template.head
+        + "".join(
+            f' {key}="{_escape_attribute(value)}"' for key, value in merged.items()
+        )
+        + f'><use href="{_escape_attribute(href)}"></use></svg>'
+    )
+
+
+def preload_icons() -> int:
+    """
+    Parse every icon of ICON_DIR ahead of the first request.
+    """
+    count = 0
+
+    for path in ICON_DIR.glob("*.svg"):
+        _load_icon(path.stem, path.stat().st_mtime_ns)
+        count += 1
+
+    return count
 
 
 @register.simple_tag
@@ -19,23 +153,29 @@ def icon(icon_name, class_str="", **kwargs):
     SVG element. Any additional keyword arguments will be added as attributes
     to the SVG element.
 
+    Icons are parsed once and cached by name and modification time, so an
+    edited file is picked up without a restart. With ICON_SPRITE enabled and
+    a sprite built by `build_icon_sprite`, only a `<use>` reference to the
+    icon's symbol is emitted.
+
     Example:
 
     ```
     {% icon "icon-name" "icon" fill="#000" %}
     ```
     """
-    path = ICON_DIR / f"{icon_name}.svg"
-
-    ET.register_namespace("", "http://www.w3.org/2000/svg")
-    tree = ET.parse(path)
-
-    root = tree.getroot()
-    root.set("class", class_str)
+    mtime = (ICON_DIR / f"{icon_name}.svg").stat().st_mtime_ns
+    attributes = (
+        ("class", class_str),
+        *((key, str(value)) for key, value in kwargs.items()),
+    )
 
-    for key, value in kwargs.items():
-        root.set(key, value)
-
-    svg = ET.tostring(root, encoding="unicode", method="html")
+    if settings.ICON_SPRITE and (manifest := get_sprite_manifest()) is not None:
+        if (symbol_id := manifest["symbols"].get(icon_name)) is not None:
+            return mark_safe(
+                _render_sprite_icon(
+                    icon_name, mtime, attributes, f"{manifest['url']}#{symbol_id}"
+                )
+            )
 
-    return mark_safe(svg)
+    return mark_safe(_render_icon(icon_name, mtime, attributes))
@@ -0,0 +1,301 @@
+import datetime
+import functools
+import typing
+
+from django.urls import reverse
+from django.utils.html import conditional_escape
+
+from .templatetags.icons import icon, icons_version
+
+TOKEN_PLACEHOLDER = "__token__"
+
+FRAGMENT_ICONS = ("clock", "clock-filled")
+
+
+@functools.lru_cache(maxsize=16)
+def _fragments(
+    version: typing.Tuple[typing.Optional[int], ...],
+) -> typing.Dict[str, str]:
+    """
+    Pieces of markup that are the same for every tile, built once per version
+    of their icons so a rebuilt sprite or an edited icon is picked up.
+    """
+    edit_event_url = reverse("edit_event", args=[TOKEN_PLACEHOLDER])
+    edit_availability_event_url = reverse(
+        "edit_availability_event", args=[TOKEN_PLACEHOLDER]
+    )
+
+    return {
+        "clock": f'<div class="availability">{icon("clock", "icon")}</div>',
+        "clock_filled": (
+            f'<div class="availability">{icon("clock-filled", "icon")}</div>'
+        ),
+        "clock_expanded": f'<div class="availability ">{icon("clock", "icon")}</div>',
+        "clock_filled_expanded": (
+            f'<div class="availability ">{icon("clock-filled", "icon")}</div>'
+        ),
+        "edit_event_url": edit_event_url,
+        "edit_availability_event_url": edit_availability_event_url,
+    }
+
+
+def _format_time(value: datetime.time) -> str:
+    """
+    Same output as the `time:"h:i A"` template filter.
+    """
+    return (
+        f"{value.hour % 12 or 12:02d}:{value.minute:02d} "
+        f"{'AM' if value.hour < 12 else 'PM'}"
+    )
+
+
+def _is_before(value: typing.Any, other: typing.Any) -> bool:
+    # Template comparisons between incomparable values are simply false.
+    try:
+        return bool(value < other)
+    except TypeError:
+        return False
+
+
+class DayTileRenderer:
+    """
+    Render day tiles in Python instead of including day_tile.html per day.
+
+    Produces the same markup as the template for every branch (density,
+    expanded and compact tiles), only without the template's indentation.
+    """
+
+    def __init__(
+        self,
+        today: typing.Optional[datetime.date],
+        now: typing.Any,
+        display_mode: typing.Optional[str] = None,
+        start_date: typing.Optional[datetime.date] = None,
+        expanded: bool = False,
+        density: bool = False,
+        exclude_sensitive_data: bool = False,
+        exclude_events: bool = False,
+        exclude_availability: bool = False,
+        overlay: bool = False,
+    ):
+        self.today = today
+        self.now_time = getattr(now, "time", lambda: "")()
+        self.expanded = expanded
+        self.density = density
+        self.show_availability = not exclude_sensitive_data and not exclude_availability
+        self.show_events = not exclude_events and not exclude_sensitive_data
+        self.overlay = overlay
+        self.fragments = _fragments(icons_version(*FRAGMENT_ICONS))
+        self.edit_event_query = (
+            f"?display-mode={conditional_escape(display_mode or '')}"
+            f"&start-date={start_date.strftime('%Y-%m') if start_date else ''}"
+        )
+
+    def render(self, days: typing.Iterable[typing.Dict]) -> str:
+        return "".join(self.render_day(day) for day in days)
+
+    def render_day(self, day: typing.Dict) -> str:
+        current_date = day["datetime"].date()
+        availability = day.get("availability")
+        parts = [self._open_tag(day, current_date, availability)]
+
+        parts.append(f'<div class="day-number">{current_date.day}</div>')
+
+        if self.density:
+            parts.extend(self._density_content(day, availability))
+        elif self.expanded:
+            parts.extend(self._expanded_content(day, current_date, availability))
+        else:
+            parts.extend(self._compact_content(day, availability))
+
+        parts.append("</div>")
+
+        return "".join(parts)
+
+    def _open_tag(
+        self, day: typing.Dict, current_date: datetime.date, availability: typing.Any
+    ) -> str:
+        classes = ["day"]
+
+        if current_date == self.today:
+            classes.append("today")
+
+        if day.get("is_weekend"):
+            classes.append("weekend")
+
+        if day.get("is_previous_month"):
+            classes.append("previous-month")
+
+        if day.get("is_selected"):
+            classes.append("selected")
+
+        attributes = [
+            f'class="{" ".join(classes)}"',
+            f'data-date="{current_date.strftime("%Y-%m-%d")}"',
+        ]
+
+        if day.get("is_previous_month"):
+            attributes.append('data-is-previous-month="true"')
+
+        if self.density and day.get("event_count"):
+            attributes.append(f'data-event-count="{day["event_count"]}"')
+
+        if self.show_availability and availability:
+            attributes.append('data-has-availability="true"')
+            attributes.append(
+                "data-jsonified-time-slots="
+                f'"{conditional_escape(availability.jsonified_time_slots)}"'
+            )
+
+            if self.density or self.expanded:
+                attributes.append(
+                    f'data-availability-token="{conditional_escape(availability.token)}"'
+                )
+
+                if self.overlay:
+                    attributes.append(
+                        "data-availability-section="
+                        f'"{conditional_escape(availability.section_token)}"'
+                    )
+
+        return f"<div {' '.join(attributes)}>"
+
+    def _availability(self, availability: typing.Any, spaced: bool) -> str:
+        if spaced:
+            return self.fragments[
+                "clock_filled_expanded" if availability else "clock_expanded"
+            ]
+
+        return self.fragments["clock_filled" if availability else "clock"]
+
+    def _marker(self, day: typing.Dict) -> typing.List[str]:
+        if day.get("has_ongoing_event"):
+            return ['<div class="event-marker ongoing"></div>']
+
+        if day.get("has_future_event"):
+            return ['<div class="event-marker upcoming"></div>']
+
+        if day.get("has_past_event"):
+            return ['<div class="event-marker finished"></div>']
+
+        return []
+
+    def _density_content(
+        self, day: typing.Dict, availability: typing.Any
+    ) -> typing.List[str]:
+        parts = []
+
+        if self.show_availability:
+            parts.append(self._availability(availability, spaced=False))
+
+        if self.show_events:
+            if day.get("event_count"):
+                parts.append(
+                    '<div class="event-count"><span class="count">'
+                    f'{day["event_count"]}</span></div>'
+                )
+
+            parts.extend(self._marker(day))
+
+        return parts
+
+    def _compact_content(
+        self, day: typing.Dict, availability: typing.Any
+    ) -> typing.List[str]:
+        parts = []
+
+        if self.show_availability:
+            parts.append(self._availability(availability, spaced=True))
+
+        if self.show_events:
+            parts.extend(self._marker(day))
+
+        return parts
+
+    def _expanded_content(
+        self, day: typing.Dict, current_date: datetime.date, availability: typing.Any
+    ) -> typing.List[str]:
+        parts = []
+
+        if self.show_availability:
+            parts.append(self._availability(availability, spaced=True))
+
+        if not self.show_events:
+            return parts
+
+        events = day.get("events") or []
+
+        if events:
+            parts.append(
+                '<div class="event-count"><span class="count">'
+                f"{len(events)}</span></div>"
+            )
+
+        parts.append('<div class="events">')
+
+        for event in events:
+            parts.append(self._event(event, current_date))
+
+        parts.append("</div>")
+
+        return parts
+
+    def _event_status(self, event: typing.Any, current_date: datetime.date) -> str:
+        is_past = _is_before(current_date, self.today)
+
+        if event.ending_time:
+            if current_date == self.today:
+                if _is_before(event.ending_time, self.now_time):
+                    return "finished"
+
+                if _is_before(event.starting_time, self.now_time):
+                    return "ongoing"
+
+                return "upcoming"
+
+            return "finished" if is_past else "upcoming"
+
+        if is_past:
+            return "finished"
+
+        if current_date == self.today:
+            return "ongoing"
+
+        return "upcoming"
+
+    def _event(self, event: typing.Any, current_date: datetime.date) -> str:
+        token = conditional_escape(event.token)
+
+        if getattr(event, "is_availability_event", False):
+            href = self.fragments["edit_availability_event_url"].replace(
+                TOKEN_PLACEHOLDER, token
+            )
+        else:
+            href = (
+                self.fragments["edit_event_url"].replace(TOKEN_PLACEHOLDER, token)
+                + self.edit_event_query
+            )
+
+        status = self._event_status(event, current_date)
+        section = (
+            f' data-section="{conditional_escape(event.section_token)}"'
+            if self.overlay
+            else ""
+        )
+
+        if event.starting_time:
+            time = (
+                f"{_format_time(event.starting_time)} - "
+                f"{_format_time(event.ending_time)}"
+            )
+        else:
+            time = "All day"
+
+        title = conditional_escape(event.title)
+
+        return (
+            f'<a href="{href}"{section} class="{status} event {status}">'
+            f'<span class="event-time">{time}</span>'
+            f'<span class="event-title" title="{title}">{title}</span>'
+            "</a>"
+        )
@@ -27,9 +27,11 @@ urlpatterns = [
     path('availabilities/events/<str:token>/delete', views.DeleteAvailabilityEvent.as_view(), name="delete_availability_event"),
     
     path('sections/add', views.AddSection.as_view(), name="add_section"),
+    path('sections/free-busy', views.CommonFreeSlots.as_view(), name="common_free_slots"),
     path('sections/<str:token>/delete', views.DeleteSection.as_view(), name="delete_section"),
     path('sections/<str:token>/rename', views.RenameSection.as_view(), name="rename_section"),
     path('sections/<str:token>/days/<date:date>', views.DayDetails.as_view(), name="day_details"),
+    path('sections/<str:token>/months/<int:year>/<int:month>', views.MonthData.as_view(), name="month_data"),
     
     path('external/section/<str:token>', views.ExternalSectionView.as_view(), name="external_section"),
     path('external/availability/<str:token>', views.ExternalAvailability.as_view(), name="external_availability"),
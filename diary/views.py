@@ -1,17 +1,20 @@
 import calendar
+import hashlib
 import json
 import typing
-from datetime import date, datetime, time, timedelta
+from datetime import date, datetime, timedelta
 
 import pytz
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpRequest
+from django.conf import settings
+from django.http import HttpRequest, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import get_template, render_to_string
 from django.urls import reverse
 from django.views import View
 
-from account.models import Settings
 from utilities.generate_meta_tags import generate_meta_tags
 from utilities.responses import (
     ApiErrorKwargsResponse,
@@ -23,6 +26,7 @@ from utilities.time import (
     time_slots,
 )
 
+from .caching import load_cached_calendar_range
 from .forms import (
     AddAvailabilityTimeSlotForm,
     AddSectionForm,
@@ -31,8 +35,17 @@ from .forms import (
     EditAcceptedInvitationForm,
     EditAvailabilityEventForm,
     EditEventForm,
+    FreeBusyForm,
     RespondToEventInvitationForm,
 )
+from .loaders import (
+    CalendarRange,
+    EventTile,
+    load_calendar_range,
+    load_day_bundle,
+    load_day_densities,
+    load_sections_calendar_range,
+)
 from .models import (
     Availability,
     AvailabilityEvent,
@@ -48,8 +61,17 @@ DISPLAY_MODE_MULTI = "multi"
 DISPLAY_MODE_YEAR = "year"
 VALID_DISPLAY_MODES = {DISPLAY_MODE_SINGLE, DISPLAY_MODE_MULTI, DISPLAY_MODE_YEAR}
 
+STREAMED_MONTHS_MARKER = "<!-- streamed-months -->"
+
 
 class DisplayModeView(View):
+    # Whether the day tiles list each day's events. Views rendering compact
+    # tiles only need per-day markers, which are read from the day summaries.
+    tile_events = True
+    # Set by views showing every section of the user on one grid.
+    overlay = False
+    _request_now: typing.Optional[datetime] = None
+
     def _get_display_mode(self) -> str:
         mode = self.request.GET.get("display-mode", DISPLAY_MODE_SINGLE)
 
@@ -61,23 +83,33 @@ class DisplayModeView(View):
         if start_date:
             return datetime.strptime(start_date, "%Y-%m").date()
 
-        return datetime.now(tz=self._get_user_timezone()).replace(day=1).date()
+        return self._get_now(self._get_user_timezone()).replace(day=1).date()
 
-    def _get_user_timezone(self) -> pytz.timezone:
-        if self.request.user.is_anonymous:
-            return pytz.timezone("UTC")
+    def _get_now(self, user_timezone: pytz.timezone) -> datetime:
+        if self._request_now is None:
+            self._request_now = datetime.now(tz=pytz.utc)
 
-        settings = get_object_or_404(Settings, user=self.request.user)
+        return self._request_now.astimezone(user_timezone)
 
-        return pytz.timezone(settings.time_zone)
+    def _get_user_timezone(self) -> pytz.timezone:
+        return self.request.user_context.timezone
 
     def _get_section(self, section_token: typing.Optional[str]):
         if section_token:
-            return get_object_or_404(
-                Section, token=section_token, user=self.request.user
-            )
+            return self.request.user_context.get_section(section_token)
+
+        sections = self.request.user_context.sections
+
+        return sections[0] if sections else None
 
-        return Section.objects.filter(user=self.request.user).first()
+    def _is_overlay_mode(self) -> bool:
+        return self.request.GET.get("sections", None) == "all"
+
+    def _get_sections(self, section: typing.Optional[Section]) -> typing.List[Section]:
+        if self.overlay:
+            return list(self.request.user_context.sections)
+
+        return [section] if section is not None else []
 
     def _calculate_end_date(self, start_date: date, display_mode: str) -> date:
         months_ahead = {
@@ -91,33 +123,29 @@ class DisplayModeView(View):
 
         return end_date.replace(day=last_day)
 
-    def _get_events(
-        self, section: Section, date: date
-    ) -> typing.List[typing.Union[Event, AvailabilityEvent]]:
-        def sort_key(event: typing.Union[Event, AvailabilityEvent]) -> time:
-            if isinstance(event, Event):
-                return event.starting_time or datetime.min.time()
-
-            return event.start_time
-
-        return sorted(
-            list(Event.objects.filter(section=section, dates__contains=[date]))
-            + [
-                invitation.event
-                for invitation in EventInvitation.objects.filter(
-                    accepted=True,
-                    event__dates__contains=[date],
-                    section=section,
-                )
-            ]
-            + list(
-                AvailabilityEvent.objects.filter(
-                    availability__section=section,
-                    availability__date=date,
-                )
-            ),
-            key=sort_key,
-        )
+    def _get_events(self, section: Section, date: date) -> typing.List[EventTile]:
+        if self.overlay:
+            return load_sections_calendar_range(
+                self._get_sections(section), date, date
+            ).events_for(date)
+
+        return load_cached_calendar_range(section, date, date).events_for(date)
+
+    def _load_calendar_range(
+        self, section: Section, start_date: date, end_date: date
+    ) -> CalendarRange:
+        if self.overlay:
+            return load_sections_calendar_range(
+                self._get_sections(section),
+                start_date,
+                end_date,
+                include_events=self.tile_events,
+            )
+
+        if self.tile_events:
+            return load_cached_calendar_range(section, start_date, end_date)
+
+        return load_calendar_range(section, start_date, end_date, include_events=False)
 
     def _generate_calendar_days(
         self,
@@ -125,19 +153,26 @@ class DisplayModeView(View):
         end_date: date,
         section: Section,
         user_timezone: pytz.timezone,
+        calendar_range: typing.Optional[CalendarRange] = None,
     ) -> typing.List[typing.Dict]:
         days = []
         current_date = start_date
 
+        if calendar_range is None or not calendar_range.covers(start_date, end_date):
+            calendar_range = self._load_calendar_range(section, start_date, end_date)
+
         first_monday = self._get_first_monday(start_date)
         self._add_previous_month_days(days, start_date, first_monday)
 
-        while current_date <= end_date:
-            events = self._get_events(section, current_date)
+        now = self._get_now(user_timezone)
 
-            now = datetime.now(tz=user_timezone)
+        while current_date <= end_date:
+            if calendar_range.summaries is not None and current_date == now.date():
+                events = self._get_events(section, current_date)
+            else:
+                events = calendar_range.events_for(current_date)
 
-            has_event = len(events) > 0
+            has_event = len(events) > 0 or calendar_range.has_events_on(current_date)
             is_today = current_date == now.date()
             is_past = current_date < now.date()
             is_future = current_date > now.date()
@@ -183,10 +218,7 @@ class DisplayModeView(View):
                     "has_past_event": has_past_event,
                     "has_ongoing_event": has_ongoing_event,
                     "has_future_event": has_future_event,
-                    "availability": Availability.objects.filter(
-                        date=current_date,
-                        section=section,
-                    ).first(),
+                    "availability": calendar_range.availability_for(current_date),
                     "notes": [],
                     **self._extend_day(
                         start_date=start_date,
@@ -215,20 +247,140 @@ class DisplayModeView(View):
         section: Section,
         user_timezone: pytz.timezone,
     ) -> typing.List[typing.Dict]:
+        return list(
+            self._iter_monthly_calendar(start_date, end_date, section, user_timezone)
+        )
+
+    def _iter_monthly_calendar(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        section: Section,
+        user_timezone: pytz.timezone,
+    ) -> typing.Iterator[typing.Dict]:
+        current_month = start_date
+        calendar_range = self._load_calendar_range(
+            section,
+            start_date.replace(day=1),
+            self._get_last_day_of_month(end_date),
+        )
+
+        while current_month <= end_date:
+            yield {
+                "month": current_month,
+                "name": current_month.strftime("%B"),
+                "days": self._generate_calendar_days(
+                    current_month.replace(day=1),
+                    self._get_last_day_of_month(current_month),
+                    section,
+                    user_timezone,
+                    calendar_range,
+                ),
+            }
+            current_month += relativedelta(months=1)
+
+    def _render_streaming(
+        self,
+        template_name: str,
+        context: typing.Dict,
+        months: typing.Iterable[typing.Dict],
+        month_template_name: str = "diary/month.html",
+        **month_context: typing.Any,
+    ) -> StreamingHttpResponse:
+        """
+        Stream the page shell first, then each month grid as it is built.
+
+        The shell is rendered with `stream_months` set, which makes the page
+        template emit STREAMED_MONTHS_MARKER where the months would go.
+        """
+
+        def stream() -> typing.Iterator[str]:
+            shell = render_to_string(
+                template_name,
+                {**context, "stream_months": True},
+                self.request,
+            )
+            head, tail = shell.split(STREAMED_MONTHS_MARKER, 1)
+
+            yield head
+
+            month_template = get_template(month_template_name)
+
+            for month in months:
+                yield month_template.render(
+                    {**context, **month_context, "month": month},
+                    self.request,
+                )
+
+            yield tail
+
+        return StreamingHttpResponse(stream(), content_type="text/html; charset=utf-8")
+
+    def _is_density_mode(self, display_mode: str) -> bool:
+        return (
+            display_mode == DISPLAY_MODE_YEAR
+            and self.request.GET.get("density", None) == "true"
+        )
+
+    def _generate_density_calendar(
+        self,
+        start_date: date,
+        end_date: date,
+        section: Section,
+        user_timezone: pytz.timezone,
+    ) -> typing.List[typing.Dict]:
+        now = self._get_now(user_timezone)
+        densities, availabilities = load_day_densities(
+            self._get_sections(section),
+            start_date.replace(day=1),
+            self._get_last_day_of_month(end_date),
+            now,
+        )
         months = []
         current_month = start_date
 
         while current_month <= end_date:
+            month_start = current_month.replace(day=1)
+            month_end = self._get_last_day_of_month(current_month)
+            days = []
+            current_date = month_start
+
+            self._add_previous_month_days(
+                days, month_start, self._get_first_monday(month_start)
+            )
+
+            while current_date <= month_end:
+                density = densities.get(current_date)
+
+                days.append(
+                    {
+                        "datetime": datetime.combine(current_date, datetime.min.time()),
+                        "is_weekend": current_date.weekday() in {5, 6},
+                        "is_previous_month": False,
+                        "event_count": density.event_count if density else 0,
+                        "has_past_event": bool(density and density.has_past_event),
+                        "has_ongoing_event": bool(
+                            density and density.has_ongoing_event
+                        ),
+                        "has_future_event": bool(density and density.has_future_event),
+                        "availability": availabilities.get(current_date),
+                        **self._extend_day(
+                            start_date=month_start,
+                            end_date=month_end,
+                            section=section,
+                            user_timezone=user_timezone,
+                            current_date=current_date,
+                            events=[],
+                        ),
+                    }
+                )
+                current_date += timedelta(days=1)
+
             months.append(
                 {
                     "month": current_month,
                     "name": current_month.strftime("%B"),
-                    "days": self._generate_calendar_days(
-                        current_month.replace(day=1),
-                        self._get_last_day_of_month(current_month),
-                        section,
-                        user_timezone,
-                    ),
+                    "days": days,
                 }
             )
             current_month += relativedelta(months=1)
@@ -306,11 +458,13 @@ class Home(DisplayModeView):
         user_timezone = self._get_user_timezone()
         start_date = self._get_start_date()
         end_date = self._calculate_end_date(start_date, display_mode)
+        self.overlay = self._is_overlay_mode()
 
         context = {
-            "now": datetime.now(tz=user_timezone),
-            "today": datetime.now(tz=user_timezone).date(),
+            "now": self._get_now(user_timezone),
+            "today": self._get_now(user_timezone).date(),
             "section": section,
+            "overlay": self.overlay,
             "display_mode": display_mode,
             "start_date": start_date,
             "end_date": end_date,
@@ -322,10 +476,21 @@ class Home(DisplayModeView):
             ),
         }
 
+        streamed_months = None
+
         if display_mode == DISPLAY_MODE_SINGLE:
             context["days"] = self._generate_calendar_days(
                 start_date, end_date, section, user_timezone
             )
+        elif self._is_density_mode(display_mode):
+            context["density"] = True
+            context["months"] = self._generate_density_calendar(
+                start_date, end_date, section, user_timezone
+            )
+        elif settings.CALENDAR_STREAMING:
+            streamed_months = self._iter_monthly_calendar(
+                start_date, end_date, section, user_timezone
+            )
         else:
             context["months"] = self._generate_monthly_calendar(
                 start_date, end_date, section, user_timezone
@@ -336,17 +501,22 @@ class Home(DisplayModeView):
         if upcoming_event:
             context["upcoming_event"] = upcoming_event
 
+        if streamed_months is not None:
+            return self._render_streaming(
+                self.template_name, context, streamed_months, expanded=True
+            )
+
         return render(request, self.template_name, context)
 
     def _get_upcoming_event(
         self, user_timezone: pytz.timezone, section: Section
-    ) -> typing.Optional[Event]:
-        events_today = self._get_events(section, datetime.now(tz=user_timezone).date())
+    ) -> typing.Optional[EventTile]:
+        events_today = self._get_events(section, self._get_now(user_timezone).date())
 
         for event in events_today:
             if (
                 not event.starting_time
-                or event.starting_time > datetime.now(tz=user_timezone).time()
+                or event.starting_time > self._get_now(user_timezone).time()
             ):
                 return event
 
@@ -362,8 +532,81 @@ class Home(DisplayModeView):
         )
 
 
+class MonthData(DisplayModeView):
+    def get(self, request: HttpRequest, token: str, year: int, month: int):
+        if not request.user.is_authenticated:
+            return ApiErrorKwargsResponse(message="Not authenticated.", status=401)
+
+        try:
+            start_date = date(year, month, 1)
+        except ValueError:
+            return ApiErrorKwargsResponse(message="Invalid month.", status=400)
+
+        section = self._get_section(token)
+        user_timezone = self._get_user_timezone()
+        days = self._generate_calendar_days(
+            start_date,
+            self._get_last_day_of_month(start_date),
+            section,
+            user_timezone,
+        )
+
+        payload = {
+            "month": start_date.strftime("%Y-%m"),
+            "today": self._get_now(user_timezone).date().isoformat(),
+            "days": [
+                self._serialize_day(day) for day in days if not day["is_previous_month"]
+            ],
+        }
+        etag = self._generate_etag(payload)
+
+        response = get_conditional_response(request, etag=etag)
+
+        if response is None:
+            response = ApiSuccessKwargsResponse(**payload)
+            response["ETag"] = etag
+
+        patch_cache_control(response, private=True, no_cache=True)
+
+        return response
+
+    def _serialize_day(self, day: typing.Dict) -> typing.Dict:
+        serialized = {
+            "date": day["datetime"].date().isoformat(),
+            "past": day["has_past_event"],
+            "ongoing": day["has_ongoing_event"],
+            "future": day["has_future_event"],
+            "events": [self._serialize_event(event) for event in day["events"]],
+        }
+
+        if (availability := day["availability"]) is not None:
+            serialized["availability"] = {
+                "token": availability.token,
+                "slots": availability.time_slots,
+            }
+
+        return serialized
+
+    @staticmethod
+    def _serialize_event(event: EventTile) -> typing.Dict:
+        return {
+            "token": event.token,
+            "title": event.title,
+            "start": event.starting_time and event.starting_time.strftime("%H:%M"),
+            "end": event.ending_time and event.ending_time.strftime("%H:%M"),
+            "availability": event.is_availability_event,
+        }
+
+    @staticmethod
+    def _generate_etag(payload: typing.Dict) -> str:
+        content = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+
+        return f'"{hashlib.sha1(content.encode()).hexdigest()}"'
+
+
 class CreateEvent(DisplayModeView):
     template_name = "diary/create_event.html"
+    tile_events = False
 
     def get(self, request: HttpRequest):
         self.selected_days = self._get_selected_days()
@@ -375,7 +618,7 @@ class CreateEvent(DisplayModeView):
         end_date = self._calculate_end_date(start_date, display_mode)
 
         context = {
-            "today": datetime.now(tz=user_timezone).date(),
+            "today": self._get_now(user_timezone).date(),
             "section": section,
             "start_date": start_date,
             "end_date": end_date,
@@ -475,6 +718,7 @@ class DeleteSection(View):
 
 class EditEvent(DisplayModeView):
     template_name = "diary/edit_event.html"
+    tile_events = False
 
     def get(self, request: HttpRequest, token: str):
         event = get_object_or_404(Event, token=token)
@@ -499,7 +743,7 @@ class EditEvent(DisplayModeView):
         end_date = self._calculate_end_date(start_date, display_mode)
 
         context = {
-            "today": datetime.now(tz=user_timezone).date(),
+            "today": self._get_now(user_timezone).date(),
             "display_mode": display_mode,
             "event": self.event,
             "section": self.event.section,
@@ -650,6 +894,7 @@ class Invitations(View):
 
 class ExternalSectionView(DisplayModeView):
     template_name = "diary/external_section.html"
+    tile_events = False
 
     def get(self, request: HttpRequest, token: str):
         section = get_object_or_404(Section, token=token)
@@ -666,7 +911,7 @@ class ExternalSectionView(DisplayModeView):
         end_date = self._calculate_end_date(start_date, display_mode)
 
         context = {
-            "today": datetime.now(tz=user_timezone).date(),
+            "today": self._get_now(user_timezone).date(),
             "section": section,
             "display_mode": display_mode,
             "start_date": start_date,
@@ -699,6 +944,7 @@ class ExternalSectionView(DisplayModeView):
 
 class DayDetails(DisplayModeView):
     template_name = "diary/day_details.html"
+    tile_events = False
 
     def get(self, request: HttpRequest, token: str, date: date):
         if not request.user.is_authenticated:
@@ -706,42 +952,35 @@ class DayDetails(DisplayModeView):
 
         self.date = date
 
-        section = get_object_or_404(Section, token=token, user=request.user)
-        events = Event.objects.filter(
-            dates__contains=[date], owner=request.user, section=section
-        )
-        invitations = EventInvitation.objects.filter(
-            user=request.user,
-            accepted=True,
-            event__dates__contains=[date],
-            section=section,
-        )
-        availability = Availability.objects.filter(
-            date=date, user=request.user, section=section
-        ).first()
-        availability_events = AvailabilityEvent.objects.filter(
-            availability__date=date, availability__section=section
-        )
+        section = request.user_context.get_section(token)
+        user_timezone = self._get_user_timezone()
+        self.bundle = load_day_bundle(section, request.user, date)
 
         context = {
-            "today": datetime.now(tz=self._get_user_timezone()).date(),
+            "today": self._get_now(user_timezone).date(),
             "date": date,
-            "events": events,
+            "events": self.bundle.events,
             "section": section,
-            "invitations": invitations,
-            "availability": availability,
-            "availability_events": availability_events,
+            "invitations": self.bundle.invitations,
+            "availability": self.bundle.availability,
+            "availability_events": self.bundle.availability_events,
             "days": self._generate_calendar_days(
                 date.replace(day=1),
                 self._get_last_day_of_month(date),
                 section,
-                self._get_user_timezone(),
+                user_timezone,
             ),
             "meta_tags": self._generate_meta_tags(token, date),
         }
 
         return render(request, self.template_name, context)
 
+    def _get_events(self, section: Section, date: date) -> typing.List[EventTile]:
+        if date == self.date:
+            return self.bundle.tiles
+
+        return super()._get_events(section, date)
+
     def _extend_day(self, current_date: date, **kwargs: typing.Any) -> dict:
         return {
             "is_selected": current_date == self.date,
@@ -774,7 +1013,7 @@ class EditAcceptedInvitation(EditEvent):
 
         context = {
             "invitation": self.invitation,
-            "today": datetime.now(tz=user_timezone).date(),
+            "today": self._get_now(user_timezone).date(),
             "display_mode": display_mode,
             "event": self.event,
             "section": self.invitation.section,
@@ -846,7 +1085,7 @@ class EventDetails(EditEvent):
         end_date = self._calculate_end_date(start_date, display_mode)
 
         context = {
-            "today": datetime.now(tz=user_timezone).date(),
+            "today": self._get_now(user_timezone).date(),
             "display_mode": display_mode,
             "event": self.event,
             "section": self.event.section,
@@ -880,6 +1119,7 @@ class EventDetails(EditEvent):
 
 class ExternalAvailability(DisplayModeView):
     template_name = "diary/external_availability.html"
+    tile_events = False
 
     def get(self, request: HttpRequest, token: str):
         self.availability = get_object_or_404(Availability, token=token)
@@ -901,7 +1141,7 @@ class ExternalAvailability(DisplayModeView):
         end_date = self._get_last_day_of_month(self.availability.date)
 
         context = {
-            "today": datetime.now(tz=user_timezone).date(),
+            "today": self._get_now(user_timezone).date(),
             "days": self._generate_calendar_days(
                 start_date, end_date, self.availability.section, user_timezone
             ),
@@ -952,6 +1192,7 @@ class ExternalAvailability(DisplayModeView):
 
 class EditAvailabilityEvent(DisplayModeView):
     template_name = "diary/edit_availability_event.html"
+    tile_events = False
 
     def get(self, request: HttpRequest, token: str):
         self.event = get_object_or_404(
@@ -964,7 +1205,7 @@ class EditAvailabilityEvent(DisplayModeView):
         end_date = self._get_last_day_of_month(self.event.availability.date)
 
         context = {
-            "today": datetime.now(tz=user_timezone).date(),
+            "today": self._get_now(user_timezone).date(),
             "days": self._generate_calendar_days(
                 start_date, end_date, self.event.availability.section, user_timezone
             ),
@@ -1096,6 +1337,44 @@ class ClearAvailabilityTimeSlots(View):
         return ApiSuccessKwargsResponse(message="Availability cleared successfully.")
 
 
+class CommonFreeSlots(View):
+    def get(self, request: HttpRequest):
+        if not request.user.is_authenticated:
+            return ApiErrorKwargsResponse(message="Not authenticated.", status=401)
+
+        form = FreeBusyForm(
+            {
+                "sections": request.GET.get("sections", None),
+                "start_date": request.GET.get("start-date", None),
+                "end_date": request.GET.get("end-date", None),
+            }
+        )
+
+        if not form.is_valid():
+            return ApiFormErrorResponse(form)
+
+        user_timezone = request.user_context.timezone
+        free_busy = form.load(request.user, user_timezone.zone)
+
+        return ApiSuccessKwargsResponse(
+            time_zone=user_timezone.zone,
+            users=len(free_busy.users),
+            days=[
+                {
+                    "date": date.isoformat(),
+                    "slots": [
+                        {
+                            "start": time_slots[start].start.strftime("%H:%M"),
+                            "end": time_slots[end - 1].end.strftime("%H:%M"),
+                        }
+                        for start, end in ranges
+                    ],
+                }
+                for date, ranges in free_busy.common_ranges().items()
+            ],
+        )
+
+
 class RenameSection(View):
     def post(self, request: HttpRequest, token: str):
         section = Section.objects.filter(token=token, user=request.user).first()
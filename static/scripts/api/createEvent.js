@@ -1,5 +1,5 @@
 import { generateRequestHeaders } from './generateRequestHeaders.js';
-import { json } from './utils.js';
+import { json, recurrenceData } from './utils.js';
 import { wrapResponse } from './wrapResponse.js';
 
 const createEvent = async ({
@@ -12,6 +12,7 @@ const createEvent = async ({
     startTime,
     endTime,
     reminders,
+    recurrence,
 }) => {
     const url = `/events/create`;
 
@@ -29,6 +30,7 @@ const createEvent = async ({
                 dates,
                 start_time: startTime || null,
                 end_time: endTime || null,
+                ...recurrenceData(recurrence),
             }),
         }),
     );
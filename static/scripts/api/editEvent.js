@@ -1,5 +1,5 @@
 import { generateRequestHeaders } from './generateRequestHeaders.js';
-import { json } from './utils.js';
+import { json, recurrenceData } from './utils.js';
 import { wrapResponse } from './wrapResponse.js';
 
 const editEvent = async ({
@@ -13,6 +13,7 @@ const editEvent = async ({
     endTime,
     section,
     reminders,
+    recurrence,
     token,
 }) => {
     const url = `/events/${token}/edit`;
@@ -32,6 +33,7 @@ const editEvent = async ({
                 deleted_dates: deletedDates,
                 start_time: startTime || null,
                 end_time: endTime || null,
+                ...recurrenceData(recurrence),
             }),
         }),
     );
@@ -0,0 +1,23 @@
+import { generateRequestHeaders } from './generateRequestHeaders.js';
+import { wrapResponse } from './wrapResponse.js';
+
+/**
+ * Fetch the time slots that every owner of the given shared sections has
+ * free between two dates, in the requesting user's time zone.
+ */
+const getCommonFreeSlots = async ({ sections, startDate, endDate }) => {
+    const searchParams = new URLSearchParams({
+        sections: sections.join(','),
+        'start-date': startDate,
+        'end-date': endDate,
+    });
+
+    return wrapResponse(
+        fetch(`/sections/free-busy?${searchParams}`, {
+            method: 'GET',
+            headers: generateRequestHeaders({ contentType: null }),
+        }),
+    );
+};
+
+export { getCommonFreeSlots };
@@ -26,4 +26,22 @@ const json = (data) => {
     return JSON.stringify(data);
 };
 
-export { Files, formData, json };
+const recurrenceData = (recurrence) => {
+    if (recurrence === undefined) {
+        return {};
+    }
+
+    if (recurrence === null) {
+        return { recurrence_frequency: null };
+    }
+
+    return {
+        recurrence_frequency: recurrence.frequency,
+        recurrence_interval: recurrence.interval || 1,
+        recurrence_until: recurrence.until || null,
+        recurrence_count: recurrence.count || null,
+        recurrence_exceptions: recurrence.exceptions || [],
+    };
+};
+
+export { Files, formData, json, recurrenceData };
@@ -1,6 +1,6 @@
 from celery import shared_task
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.template.loader import render_to_string
 
 
@@ -36,3 +36,85 @@ def send_admin_notification(context: dict, subject: str, template: str):
     except Exception:
         return 1
     return mail_sent
+
+
+def notification(context: dict, subject: str, template: str, recipients: list) -> dict:
+    """
+    One message of `send_bulk_notifications`, sent to each recipient alone.
+    """
+    return {
+        "context": context,
+        "subject": subject,
+        "template": template,
+        "recipients": recipients,
+    }
+
+
+def enqueue_notifications(messages: list):
+    messages = [message for message in messages if message["recipients"]]
+
+    if messages:
+        send_bulk_notifications.delay(messages)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_bulk_notifications(self, messages: list):
+    """
+    Send many notifications, reusing one SMTP connection for each batch of
+    EMAIL_BATCH_SIZE emails instead of connecting for every email.
+
+    Each message is rendered once, whatever its number of recipients. A
+    message that fails to render or a batch that fails to send does not stop
+    the others: the task is retried with only the failed recipients, and
+    fails, rather than dropping them, once the retries run out. Returns the
+    number of emails sent.
+    """
+    emails = []
+    failed = {}
+
+    for index, message in enumerate(messages):
+        try:
+            content = render_to_string(message["template"], message["context"])
+        except Exception:
+            failed[index] = list(message["recipients"])
+            continue
+
+        emails.extend(
+            (
+                index,
+                recipient,
+                EmailMessage(
+                    subject=message["subject"],
+                    body=content,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[recipient],
+                ),
+            )
+            for recipient in message["recipients"]
+        )
+
+    sent = 0
+
+    for start in range(0, len(emails), settings.EMAIL_BATCH_SIZE):
+        batch = emails[start : start + settings.EMAIL_BATCH_SIZE]
+
+        try:
+            with get_connection(fail_silently=False) as connection:
+                sent += connection.send_messages([email for _, _, email in batch])
+        except Exception:
+            # Which emails of the batch went out is unknown, so all of them
+            # are retried; a duplicate beats a lost reminder.
+            for index, recipient, _ in batch:
+                failed.setdefault(index, []).append(recipient)
+
+    if failed:
+        raise self.retry(
+            args=[
+                [
+                    {**messages[index], "recipients": recipients}
+                    for index, recipients in failed.items()
+                ]
+            ]
+        )
+
+    return sent
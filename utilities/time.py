@@ -1,5 +1,7 @@
 import dataclasses
 import datetime
+import functools
+import typing
 
 import pytz
 
@@ -24,6 +26,50 @@ time_slots = [
     for time in half_hour_intervals
 ]
 
+TIME_SLOT_MINUTES = 30
+FULL_DAY_SLOT_MASK = (1 << len(time_slots)) - 1
+
+
+def time_slot_index(value: datetime.time) -> int:
+    """
+    Index in `time_slots` of the slot containing a time.
+    """
+    return (value.hour * 60 + value.minute) // TIME_SLOT_MINUTES
+
+
+def time_range_mask(start_time: datetime.time, end_time: datetime.time) -> int:
+    """
+    Bitmask of the `time_slots` a time range overlaps, bit i standing for
+    `time_slots[i]`. An end time of midnight is the end of the day.
+    """
+    end_minutes = end_time.hour * 60 + end_time.minute
+
+    if end_time.second or end_time.microsecond:
+        end_minutes += 1
+
+    if end_time == datetime.time(0, 0):
+        end_minutes = 24 * 60
+
+    first = time_slot_index(start_time)
+    last = -(-end_minutes // TIME_SLOT_MINUTES)
+
+    return (1 << last) - (1 << first) if last > first else 0
+
+
+def adjacent_time_slots(mask: int) -> typing.List[typing.List[TimeSlot]]:
+    """
+    Group the `time_slots` set in a bitmask into runs of adjacent slots.
+    """
+    slots = [[]]
+
+    for index, time_slot in enumerate(time_slots):
+        if mask >> index & 1:
+            slots[-1].append(time_slot)
+        elif slots[-1]:
+            slots.append([])
+
+    return slots
+
 
 def is_timezone_valid(timezone_name):
     try:
@@ -31,3 +77,8 @@ def is_timezone_valid(timezone_name):
         return True
     except pytz.UnknownTimeZoneError:
         return False
+
+
+@functools.lru_cache(maxsize=None)
+def get_timezone(timezone_name: str) -> pytz.BaseTzInfo:
+    return pytz.timezone(timezone_name)